@@ -1,150 +1,262 @@
 import streamlit as st
-import networkx as nx
-from pyvis.network import Network
-import pandas as pd
+import json
 import os
-import matplotlib.pyplot as plt
+
+from ffmapper import EdgeStore, GraphModel
+from ffmapper.analysis import ReachabilityIndex
+from ffmapper.background import Analytics, make_thread_pool
+from ffmapper.cache import VersionCache
+from ffmapper.csv_export import csv_bytes
+from ffmapper.distances import DistanceIndex
+from ffmapper.export import MIME_TYPES as EXPORT_MIME_TYPES, PRESETS as EXPORT_PRESETS, StaticExporter, make_pool
+from ffmapper.importer import import_stream
+from ffmapper.layout import FORCE, HIERARCHICAL, MODES, LayoutEngine
+from ffmapper.live import FRONTEND_DIR as LIVE_FRONTEND_DIR, LiveGraph, view_options
+from ffmapper.merge import load_csv_maps, merge_maps
+from ffmapper.odds import RANDOM, SMART, describe, success_odds
+from ffmapper.oplog import OpLog
+from ffmapper.parser import MarkWarning, parse_line, parse_text
+from ffmapper.profiling import (
+    PROFILE_ENV, RerunTimer, arm_profiler, configure_log, finish_profiling, profiling_enabled, start_profiling,
+)
+from ffmapper.render import GRAPH_HEIGHT, cached_ego_html
+from ffmapper.routes import RouteExplorer, count_routes, solve_required_route
+from ffmapper.storage import DB_ENV, ProjectStore
+from ffmapper.summary import ChainIndex, summarize
+from ffmapper.validate import CHECKS, DEFAULT_SECTIONS, ERROR, WARNING, validate
+
+MAX_REPORTED_ERRORS = 10
+MAX_DIFF_ROWS = 200
+ROUTES_PER_PAGE = 10
+NEW_BOOK = "➕ New book…"
+LAYOUT_CHOICES = {"Hierarchical": HIERARCHICAL, "Force-directed": FORCE, "Browser physics": None}
+COLOUR_CHOICES = {"Tags": None, "Odds (random player)": RANDOM, "Odds (smart player)": SMART}
+# Whole-map summarisation: None draws every page, else whether loops fold too.
+SUMMARY_CHOICES = {"Every page": None, "Fold chains": False, "Fold chains and loops": True}
+# Shown where a background result is not in yet; the page reruns when it is.
+COMPUTING = "_computing…_"
+POLL_SECONDS = 1.0
+
+configure_log()
+profiler = start_profiling()
+timer = RerunTimer()
 
 st.set_page_config(page_title="FF Graph Mapper", layout="wide")
 st.title("🕜Ｚ Fighting Fantasy Graph Builder")
 
+# Whole-map view: a vis.js network that lives across reruns and gets deltas.
+live_graph_view = st.components.v1.declare_component("ff_live_graph", path=LIVE_FRONTEND_DIR)
+
+
+@st.cache_resource
+def open_projects(path):
+    return ProjectStore(path)
+
+
+@st.cache_resource
+def export_pool():
+    return make_pool()
+
+
+@st.cache_resource
+def analytics_pool():
+    return make_thread_pool()
+
+
+def start_session(new_store):
+    st.session_state.edges = new_store
+    st.session_state.graph = GraphModel(new_store)
+    st.session_state.analysis = ReachabilityIndex(st.session_state.graph)
+    st.session_state.distances = DistanceIndex(st.session_state.graph)
+    st.session_state.oplog = OpLog(st.session_state.graph, st.session_state.analysis)
+    st.session_state.render_cache = VersionCache(maxsize=4)
+    st.session_state.live_graph = LiveGraph(st.session_state.graph)
+    st.session_state.chains = ChainIndex(st.session_state.graph)
+    st.session_state.expanded_groups = set()
+    # (page, message) -> MarkWarning for tokens whose marks were partly dropped.
+    st.session_state.mark_warnings = {}
+    st.session_state.exporter = StaticExporter(export_pool)
+    st.session_state.export_request = None
+    st.session_state.analytics = Analytics(analytics_pool)
+    st.session_state.layouts = {mode: LayoutEngine(st.session_state.graph, mode) for mode in MODES}
+
+
+# --- Optional persistent projects (set FF_MAPPER_DB to enable) ---
+projects = open_projects(os.environ[DB_ENV]) if os.environ.get(DB_ENV) else None
+book = None
+if projects is not None:
+    st.sidebar.header("Book")
+    known_books = projects.list_projects()
+    choice = st.sidebar.selectbox("Project", known_books + [NEW_BOOK])
+    book = st.sidebar.text_input("New book name").strip() if choice == NEW_BOOK else choice
+    if book and book != st.session_state.get("book"):
+        # Load only the selected book; other projects stay on disk.
+        start_session(projects.load(book))
+        st.session_state.book = book
+
 # ✅ Storage for user inputs must be initialized FIRST
 if "edges" not in st.session_state:
-    st.session_state.edges = []
+    start_session(EdgeStore())
+store = st.session_state.edges
+graph = st.session_state.graph
+analysis = st.session_state.analysis
+distances = st.session_state.distances
+oplog = st.session_state.oplog
+analytics = st.session_state.analytics
+st.session_state.setdefault("notices", [])
+timer.lap("session")
 
-# Find shortest path from Start to End if both exist
-shortest_path_display = ""
-if st.session_state.edges:
-    G = nx.DiGraph()
-    for edge in st.session_state.edges:
-        if edge["to"] is not None:
-            G.add_edge(edge["from"], edge["to"])
 
-    start_node = next((e["from"] for e in st.session_state.edges if e["to"] is not None), None)
-    end_nodes = [e["to"] for e in st.session_state.edges if e["to"] is not None and e["tag"].lower() == "end"]
+def persist():
+    if book:
+        projects.save(book, store)
 
-    if end_nodes:
+
+def route_text(path):
+    return " → ".join(store.pages[p] for p in path)
+
+
+# --- Background jobs: each gets a frozen snapshot and builds its own indexes ---
+def odds_job(player):
+    return lambda snapshot: success_odds(snapshot, ReachabilityIndex(snapshot), player)
+
+
+def routes_job(route_key, page_index):
+    def search(snapshot):
+        # One explorer per snapshot and filter set; paging continues its search.
+        explorer = snapshot.memo(("routes", route_key), lambda: RouteExplorer(snapshot, *route_key))
+        routes, complete = explorer.page(page_index, ROUTES_PER_PAGE)
+        more = not explorer.exhausted or len(explorer.routes) > (page_index + 1) * ROUTES_PER_PAGE
+        return explorer.reason, routes, complete, more
+
+    return search
+
+
+def route_count_job(route_key):
+    return lambda snapshot: count_routes(snapshot, *route_key)
+
+
+def issues_job(sections, marks):
+    return lambda snapshot: validate(snapshot, DistanceIndex(snapshot), ReachabilityIndex(snapshot), sections, marks)
+
+
+def notify(kind, text):
+    """Queue a sidebar message (``st.<kind>``) to show after the rerun an edit triggers."""
+    st.session_state.notices.append((kind, text))
+
+
+def skipped_lines(result):
+    return (
+        f"Skipped {len(result.errors)} of {result.lines} lines:\n\n"
+        + "\n".join(f"- line {e.lineno}: `{e.line}` ({e.message})" for e in result.errors[:MAX_REPORTED_ERRORS])
+    )
+
+
+def keep_mark_warnings(warnings):
+    """Remember dropped marks for the map checks and mention them after the rerun."""
+    for warning in warnings:
+        st.session_state.mark_warnings[warning.page, warning.message] = warning
+    if warnings:
+        notify("warning", f"Marks dropped on {len(warnings)} tokens:\n\n" + "\n".join(
+            f"- line {w.lineno}: {w.message}" for w in warnings[:MAX_REPORTED_ERRORS]
+        ))
+
+
+# --- Sidebar input: typing here reruns only this fragment; an edit reruns the page ---
+@st.fragment
+def sidebar_input():
+    for kind, text in st.session_state.notices:
+        getattr(st, kind)(text)
+    st.session_state.notices = []
+
+    # --- Undo / Redo ---
+    col_undo, col_redo = st.columns(2)
+    if col_undo.button("↶ Undo", disabled=not oplog.can_undo, help=oplog.undo_label()):
+        oplog.undo()
+        persist()
+        st.rerun()
+    if col_redo.button("↷ Redo", disabled=not oplog.can_redo, help=oplog.redo_label()):
+        oplog.redo()
+        persist()
+        st.rerun()
+
+    # --- Add New Path ---
+    st.header("Add Path")
+    path_input = st.text_input("Enter path (e.g. 123,4,10,200,400*)")
+    tag_input = st.text_input("Optional tag/comment (e.g. got potion from wizard)")
+
+    if st.button("Add Path"):
+        found = []
         try:
-            path = nx.shortest_path(G, source=start_node, target=end_nodes[0])
-            shortest_path_display = " → ".join(path)
-            st.markdown(f"**Shortest Path:** {shortest_path_display}")
-        except nx.NetworkXNoPath:
-            st.markdown("**Shortest Path:** No path found between Start and End.")
-    else:
-        st.markdown("**Shortest Path:** End node not defined.")
+            oplog.record(f"Add path {path_input.strip()}", parse_line(path_input, warnings=found))
+        except ValueError as exc:
+            notify("warning", f"Could not add path: {exc}.")
+        else:
+            keep_mark_warnings([MarkWarning(1, path_input, page, message) for page, message in found])
+        persist()
+        st.rerun()
 
-# --- Sidebar: Add New Path ---
-st.sidebar.header("Add Path")
-path_input = st.sidebar.text_input("Enter path (e.g. 123,4,10,200,400*)")
-tag_input = st.sidebar.text_input("Optional tag/comment (e.g. got potion from wizard)")
-
-if st.sidebar.button("Add Path"):
-    parts = [p.strip() for p in path_input.split(",") if p.strip()]
-
-    if len(parts) >= 2:
-        from_page_raw = parts[0]
-        from_page = from_page_raw.rstrip("*xt+s")
-        from_tag = ""
-        if "+" in from_page_raw:
-            from_tag = "Required"
-        elif "t" in from_page_raw:
-            from_tag = "End"
-        elif "x" in from_page_raw:
-            from_tag = "Dead"
-        elif "s" in from_page_raw:
-            from_tag = "Start"
-        if from_tag:
-            st.session_state.edges.append({
-                "from": from_page,
-                "to": from_page,
-                "chosen": False,
-                "tag": from_tag,
-                "is_secret": "*" in from_page_raw
-            })
-
-        for to_page in parts[1:]:
-            clean_to = to_page.rstrip("*xt+s")
-            edge_tag = ""
-            if "+" in to_page:
-                edge_tag = "Required"
-            elif "t" in to_page:
-                edge_tag = "End"
-            elif "x" in to_page:
-                edge_tag = "Dead"
-            elif "s" in to_page:
-                edge_tag = "Start"
-
-            st.session_state.edges.append({
-                "from": from_page,
-                "to": clean_to,
-                "chosen": True,
-                "tag": edge_tag,
-                "is_secret": "*" in to_page
-            })
-    else:
-        st.warning("Please enter at least a from-page and one destination.")
+    # --- Paste in CSV-style data ---
+    st.markdown("---")
+    st.markdown("### 📜 Paste Data from CSV")
+    pasted_data = st.text_area("Paste rows like: 123,4,5,6,200*,Got key")
+    if st.button("Add Pasted Paths"):
+        result = parse_text(pasted_data)
+        oplog.record(f"Paste {result.lines} lines", result.edges)
+        persist()
+        if result.errors:
+            notify("warning", skipped_lines(result))
+        keep_mark_warnings(result.warnings)
+        st.rerun()
 
-# --- Paste in CSV-style data ---
-st.sidebar.markdown("---")
-st.sidebar.markdown("### 📜 Paste Data from CSV")
-pasted_data = st.sidebar.text_area("Paste rows like: 123,4,5,6,200*,Got key")
-if st.sidebar.button("Add Pasted Paths"):
-    for line in pasted_data.splitlines():
-        if not line.strip():
-            continue
-        parts = [p.strip() for p in line.split(",") if p.strip()]
-        if len(parts) < 2:
-            continue
-        from_page_raw = parts[0]
-        from_page = from_page_raw.rstrip("*xt+s")
-        from_tag = ""
-        if "+" in from_page_raw:
-            from_tag = "Required"
-        elif "t" in from_page_raw:
-            from_tag = "End"
-        elif "x" in from_page_raw:
-            from_tag = "Dead"
-        elif "s" in from_page_raw:
-            from_tag = "Start"
-        if from_tag:
-            st.session_state.edges.append({
-                "from": from_page,
-                "to": from_page,
-                "chosen": False,
-                "tag": from_tag,
-                "is_secret": "*" in from_page_raw
-            })
-
-        for to_page in parts[1:]:
-            clean_to = to_page.rstrip("*xt+s")
-            edge_tag = ""
-            if "+" in to_page:
-                edge_tag = "Required"
-            elif "t" in to_page:
-                edge_tag = "End"
-            elif "x" in to_page:
-                edge_tag = "Dead"
-            elif "s" in to_page:
-                edge_tag = "Start"
-            st.session_state.edges.append({
-                "from": from_page,
-                "to": clean_to,
-                "chosen": True,
-                "tag": edge_tag,
-                "is_secret": "*" in to_page
-            })
-
-# --- Export ---
-st.sidebar.markdown("---")
-if st.sidebar.button("Export as CSV"):
-    df = pd.DataFrame(st.session_state.edges)
-    df["from"] = df["from"].astype(str)
-    df["to"] = df["to"].astype(str)
-    df["chosen"] = df["chosen"].astype(bool)
-    df["tag"] = df["tag"].fillna("").astype(str)
-    df["is_secret"] = df["is_secret"].fillna(False).astype(bool)
-    csv = df.to_csv(index=False).encode("utf-8")
-    st.sidebar.download_button("⬇️ Download CSV", csv, "graph_data.csv", "text/csv")
+    # --- Import a saved map or path file ---
+    st.markdown("---")
+    st.markdown("### 📂 Import File")
+    uploaded = st.file_uploader("Exported CSV or one path per line", type=["csv", "txt"])
+    if uploaded is not None and st.button("Import File"):
+        progress_bar = st.progress(0.0)
+        total = max(uploaded.size, 1)
+        try:
+            with oplog.operation(f"Import {uploaded.name}"):
+                result = import_stream(
+                    uploaded, store, progress=lambda done: progress_bar.progress(min(done / total, 1.0))
+                )
+        except ValueError as exc:
+            notify("error", f"Could not import {uploaded.name}: {exc}")
+        else:
+            notify("success", f"Imported {result.added} edges ({result.duplicates} duplicates merged).")
+            if result.errors:
+                notify("warning", skipped_lines(result))
+            keep_mark_warnings(result.warnings)
+        persist()
+        st.rerun()
+
+    # --- Merge several contributors' maps ---
+    st.markdown("---")
+    st.markdown("### 🤝 Merge Maps")
+    merge_files = st.file_uploader(
+        "One exported map per contributor", type=["csv", "txt"], accept_multiple_files=True
+    )
+    merge_projects = st.multiselect("Stored projects", known_books) if projects is not None else []
+    if st.button("Merge", disabled=len(merge_files) + len(merge_projects) < 2):
+        try:
+            maps = load_csv_maps((os.path.splitext(f.name)[0], f) for f in merge_files)
+        except ValueError as exc:
+            st.error(f"Could not read the maps: {exc}")
+        else:
+            maps += [(name, projects.load(name)) for name in merge_projects]
+            st.session_state.merge_result = merge_maps(maps)
+            st.rerun()
+
+    # --- Export ---
+    st.markdown("---")
+    if st.button("Export as CSV"):
+        st.download_button("⬇️ Download CSV", csv_bytes(store), "graph_data.csv", "text/csv")
+
+
+with st.sidebar:
+    sidebar_input()
+timer.lap("sidebar_input")
 
 # --- Help ---
 st.sidebar.markdown("---")
@@ -159,88 +271,378 @@ st.sidebar.markdown("""
 - Add s to mark a **Start** node (dark green).
 """)
 
-# --- Build Graph ---
-net = Network(height="1000px", width="100%", bgcolor="#111", font_color="white", directed=True)
-added_edges = set()
-all_nodes = set()
-node_tags = {}
-
-for edge in st.session_state.edges:
-    for node, apply_tag in [(edge["from"], True), (edge["to"], edge["tag"] in ["Required", "Dead", "End", "Start"])]:
-        if node is not None:
-            all_nodes.add(node)
-            if node not in node_tags:
-                node_tags[node] = set()
-            if apply_tag and edge["tag"]:
-                node_tags[node].add(edge["tag"])
-
-all_from = set(edge["from"] for edge in st.session_state.edges if edge["to"] is not None)
-all_to = set(edge["to"] for edge in st.session_state.edges if edge["to"] is not None)
-unexplored = all_to - all_from
-first_node = next((e["from"] for e in st.session_state.edges if e["to"] is not None), None)
-
-for node in all_nodes:
-    if node not in net.node_ids:
-        tags = node_tags.get(node, set())
-        color = "#97C2FC"
-        title = ""
-        if "Dead" in tags:
-            color = "red"
-            title = "Dead End"
-        elif "End" in tags:
-            color = "#00cc88"
-            title = "End"
-        elif "Required" in tags:
-            color = "yellow"
-            title = "Required"
-        elif "Start" in tags or node == first_node:
-            color = "#007733"
-            title = "Start"
-        elif node in unexplored:
-            color = "orange"
-
-        net.add_node(node, label=node, color=color, title=title)
-
-for edge in st.session_state.edges:
-    edge_key = (edge["from"], edge["to"])
-    if edge["to"] is not None and edge_key not in added_edges:
-        net.add_edge(
-            edge["from"],
-            edge["to"],
-            color="gray",
-            width=2,
-            title=edge["tag"] if edge["tag"] else "",
-            dashes=edge.get("is_secret", False)
-        )
-        added_edges.add(edge_key)
+
+# --- Analysis banner ---
+@st.fragment
+def analysis_banner():
+    if not len(store):
+        return
+    # Find shortest path from Start to the nearest End if both exist
+    distances.refresh()
+    end_nodes = graph.memo("end_nodes", store.end_nodes)
+
+    if end_nodes:
+        path = distances.route_to_end(graph.start_id())
+        if path:
+            st.markdown(f"**Shortest Path:** {route_text(path)}")
+        else:
+            st.markdown("**Shortest Path:** No path found between Start and End.")
+    else:
+        st.markdown("**Shortest Path:** End node not defined.")
+
+    if graph.page_ids_tagged("Required"):
+        route = analytics.result(graph, "required_route", solve_required_route)
+        if route is None:
+            st.markdown(f"**Route collecting all Required:** {COMPUTING}")
+        elif route.path is not None:
+            note = "" if route.optimal else " _(best found within time budget)_"
+            route_display = route_text(route.path)
+            st.markdown(f"**Route collecting all Required ({route.length} steps):** {route_display}{note}")
+        elif route.unreachable:
+            missing = ", ".join(store.pages[p] for p in route.unreachable)
+            st.markdown(f"**Route collecting all Required:** not reachable from Start: {missing}")
+        else:
+            st.markdown(f"**Route collecting all Required:** none found ({route.reason}).")
+
+    analysis.refresh()
+    loops = graph.memo("components", analysis.components)
+    st.caption(
+        f"{len(analysis.reaches_end)} pages can reach an End · "
+        f"{len(analysis.doomed())} doomed · "
+        f"{len(analysis.frontier)} unexplored · "
+        f"{len(loops)} loops"
+    )
+
+
+analysis_banner()
+timer.lap("banner")
+
 
 # --- Render Graph ---
-net_path = "graph.html"
-net.write_html(net_path)
-with open(net_path, "r", encoding="utf-8") as f:
-    html_string = f.read()
-st.components.v1.html(html_string, height=1000, scrolling=True)
+@st.fragment
+def graph_view():
+    col_view, col_layout, col_colour, col_summary = st.columns(4)
+    view_mode = col_view.radio("View", ["Whole map", "Focus on page"], horizontal=True)
+    fold_loops = SUMMARY_CHOICES[col_summary.radio("Summarise", list(SUMMARY_CHOICES), horizontal=True)]
+    layout_choice = col_layout.radio("Layout", list(LAYOUT_CHOICES), horizontal=True, key="layout_choice")
+    layout = st.session_state.layouts.get(LAYOUT_CHOICES[layout_choice])
+    player = COLOUR_CHOICES[col_colour.radio("Colour", list(COLOUR_CHOICES), horizontal=True)]
+    odds = None
+    if player is not None and len(store):
+        try:
+            odds = analytics.result(graph, ("odds", player), odds_job(player))
+        except ImportError:
+            st.warning("Success odds need NumPy (`pip install numpy`); colouring by tags instead.")
+        else:
+            start = store.pages[graph.start_id()]
+            if odds is None:
+                st.markdown(f"**Odds from {start} ({player} player):** {COMPUTING}")
+            else:
+                note = "" if odds.method == "solved" else " _(Monte Carlo estimate)_"
+                chance = describe(*odds.page(graph.start_id()))
+                st.markdown(f"**Odds from {start} ({player} player):** {chance}{note}")
+
+    # --- Page lookup: answered from the distance index, O(route length) ---
+    highlight = ()
+    if "clicked_page" in st.session_state:
+        # A page clicked on the map last run; only settable before the widget exists.
+        st.session_state.lookup = st.session_state.pop("clicked_page")
+    lookup = st.text_input("🔎 Look up a page", placeholder="e.g. 217", key="lookup").strip()
+    if lookup:
+        node = store.page_ids.get(lookup)
+        if node is None:
+            st.markdown(f"Page {lookup} is not on the map yet.")
+        else:
+            distances.refresh()
+            there = distances.route_from_start(node)
+            onward = distances.route_to_end(node)
+            st.markdown(
+                (f"**From Start ({len(there) - 1} steps):** {route_text(there)}" if there
+                 else "**From Start:** not reachable.")
+                + "  \n"
+                + (f"**To the nearest End ({len(onward) - 1} steps):** {route_text(onward)}" if onward
+                   else "**To an End:** no route.")
+            )
+            if st.checkbox("Highlight this route on the map", value=True):
+                highlight = tuple(distances.route_via(node))
+
+    focus_page = None
+    if view_mode == "Focus on page" and store.pages:
+        col_page, col_radius = st.columns([3, 1])
+        # A text box rather than a selectbox, which would send every page name to the browser.
+        start_id = graph.start_id()
+        start_page = store.pages[0 if start_id is None else start_id]
+        typed = col_page.text_input("Page", placeholder=f"e.g. {start_page} (empty = Start)", key="focus_page")
+        focus_page = typed.strip() or start_page
+        focus_radius = col_radius.number_input("Hops", min_value=1, max_value=10, value=2)
+        if focus_page not in store.page_ids:
+            st.markdown(f"Page {focus_page} is not on the map yet.")
+            focus_page = None
+
+    if focus_page is not None:
+        html_string = cached_ego_html(
+            st.session_state.render_cache, graph, focus_page, int(focus_radius),
+            analysis=analysis, layout=layout, odds=odds, highlight=highlight,
+        )
+        timer.count("view_bytes", len(html_string.encode("utf-8")))
+        st.components.v1.html(html_string, height=GRAPH_HEIGHT, scrolling=True)
+        # The live view's frame goes away; it starts over when shown again.
+        st.session_state.live_graph.full = True
+        return
+    live = st.session_state.live_graph
+    summary = None
+    if fold_loops is None:
+        update = live.update(analysis, layout, odds, highlight)
+    else:
+        expanded = st.session_state.expanded_groups
+        summary = graph.memo(
+            ("summary", fold_loops, frozenset(expanded)),
+            lambda: summarize(graph, st.session_state.chains, analysis, fold_loops, expanded),
+        )
+        update = live.update_summary(summary, analysis, layout, odds, highlight)
+        col_count, col_collapse = st.columns([3, 1])
+        col_count.caption(
+            f"Showing {len(summary)} nodes for {len(store.pages)} pages; click a folded node to expand it."
+        )
+        if col_collapse.button("Fold everything again", disabled=not expanded):
+            expanded.clear()
+            st.rerun(scope="fragment")
+    timer.count("view_bytes", len(json.dumps(update)))
+    event = live_graph_view(update=update, options=view_options(physics=layout is None), key="live_graph")
+    clicked = live.handle(event)
+    if clicked is not None or live.full:
+        # A click expands a folded node or looks the page up; a resync
+        # request needs a full update.
+        if summary is not None and clicked in summary.members:
+            st.session_state.expanded_groups.add(clicked)
+        elif clicked is not None:
+            st.session_state.clicked_page = clicked
+        st.rerun(scope="fragment")
+
+
+graph_view()
+timer.lap("graph_view")
+
+# --- Merge result ---
+merged = st.session_state.get("merge_result")
+if merged is not None:
+    with st.expander("🤝 Merged maps", expanded=True):
+        st.caption(
+            f"{len(merged.names)} contributors · {len(merged.union)} edges · "
+            f"{len(merged.union.pages)} pages in the union"
+        )
+        st.table([
+            {
+                "contributor": d.name, "edges": d.edges, "only theirs": d.unique, "missing": d.missing,
+                "pages only theirs": d.unique_pages, "pages missing": d.missing_pages,
+            }
+            for d in merged.diffs()
+        ])
+        col_who, col_which = st.columns(2)
+        who = col_who.selectbox("Contributor", range(len(merged.names)), format_func=merged.names.__getitem__)
+        which = col_which.radio("Edges", ["Only theirs", "Missing from theirs"], horizontal=True)
+        diff_rows = merged.only_in(who) if which == "Only theirs" else merged.missing_from(who)
+        if diff_rows:
+            st.table([
+                dict(zip(("from", "to", "chosen", "tag", "is_secret"), row)) for row in diff_rows[:MAX_DIFF_ROWS]
+            ])
+            if len(diff_rows) > MAX_DIFF_ROWS:
+                st.caption(f"First {MAX_DIFF_ROWS} of {len(diff_rows)} edges.")
+
+        edge_conflicts, page_conflicts = merged.conflicts()
+        st.markdown(f"**Conflicts:** {len(edge_conflicts)} edges, {len(page_conflicts)} pages")
+        if edge_conflicts:
+            st.table([
+                {
+                    "from": c.from_page, "to": c.to_page,
+                    "variants": "; ".join(
+                        f"{tag or '(no tag)'}{' secret' if secret else ''}: {', '.join(names)}"
+                        for (tag, secret), names in c.variants.items()
+                    ),
+                }
+                for c in edge_conflicts[:MAX_DIFF_ROWS]
+            ])
+        if page_conflicts:
+            st.table([
+                {
+                    "page": c.page,
+                    "variants": "; ".join(
+                        f"{', '.join(tags) or '(untagged)'}: {', '.join(names)}"
+                        for tags, names in c.variants.items()
+                    ),
+                }
+                for c in page_conflicts[:MAX_DIFF_ROWS]
+            ])
+
+        col_apply, col_discard = st.columns(2)
+        if col_apply.button("Add merged map to this map"):
+            oplog.record(
+                f"Merge {len(merged.names)} maps",
+                list(merged.union.iter_edges()) + list(merged.union.iter_tag_rows()),
+            )
+            persist()
+            st.session_state.merge_result = None
+            st.rerun()
+        if col_discard.button("Discard merge"):
+            st.session_state.merge_result = None
+            st.rerun()
+
+# --- Route explorer ---
+@st.fragment
+def route_explorer():
+    # The expander body runs even while collapsed; nothing is submitted until asked for.
+    if not st.toggle("Search routes", key="route_search"):
+        st.caption("Turn on to list routes from Start to an End.")
+        return
+    col_dead, col_secret, col_length = st.columns(3)
+    avoid_dead = col_dead.checkbox("Avoid Dead pages")
+    avoid_secret = col_secret.checkbox("Avoid secret paths")
+    max_length = int(col_length.number_input("Max steps (0 = any)", min_value=0, value=0)) or None
+    route_key = (avoid_dead, avoid_secret, max_length)
+    route_pages = st.session_state.setdefault("route_pages", {})
+    if route_pages.get("version") != graph.version:
+        route_pages.clear()
+        route_pages["version"] = graph.version
+    page_index = route_pages.get(route_key, 0)
+    # Each "Keep searching" is a new job; the explorer resumes where it stopped.
+    retry = ("retry", route_key, page_index)
+    found = analytics.result(
+        graph, ("routes", route_key, page_index, route_pages.get(retry, 0)), routes_job(route_key, page_index)
+    )
+    if found is None:
+        st.markdown(f"Searching for routes: {COMPUTING}")
+        return
+    reason, routes, complete, more = found
+    if reason:
+        st.markdown(f"No routes: {reason}.")
+        return
+    if st.checkbox("Count distinct routes", key="route_count"):
+        counted = analytics.result(graph, ("route_count", route_key), route_count_job(route_key))
+        if counted is None:
+            st.caption(f"Counting distinct routes: {COMPUTING}")
+        elif counted.exact:
+            st.caption(f"{counted.count:,} distinct routes")
+        else:
+            st.caption(f"At least {counted.count:,} distinct routes")
+    first = page_index * ROUTES_PER_PAGE
+    st.markdown("\n".join(
+        f"{first + i}. ({len(path) - 1} steps) " + " → ".join(store.pages[p] for p in path)
+        for i, path in enumerate(routes, 1)
+    ) or "No (more) routes.")
+    if not complete:
+        st.info("The search stopped at its time budget; it resumes where it left off.")
+        if st.button("Keep searching"):
+            route_pages[retry] = route_pages.get(retry, 0) + 1
+            st.rerun(scope="fragment")
+    col_prev, col_next = st.columns(2)
+    if col_prev.button(f"◀ Previous {ROUTES_PER_PAGE}", disabled=page_index == 0):
+        route_pages[route_key] = page_index - 1
+        st.rerun(scope="fragment")
+    if col_next.button(f"Show next {ROUTES_PER_PAGE} ▶", disabled=not (complete and more)):
+        route_pages[route_key] = page_index + 1
+        st.rerun(scope="fragment")
+
+
+with st.expander("🧭 Routes from Start to End", expanded=False):
+    route_explorer()
+timer.lap("routes")
+
+
+# --- Validation ---
+@st.fragment
+def map_checks():
+    sections = int(st.session_state.get("book_sections", DEFAULT_SECTIONS))
+    marks = tuple(st.session_state.mark_warnings.values())
+    issues = []
+    if len(store):
+        issues = analytics.result(graph, ("issues", sections, len(marks)), issues_job(sections, marks))
+    if issues is None:
+        title = f"🩹 Map checks: {COMPUTING}"
+    else:
+        error_count = sum(issue.severity == ERROR for issue in issues)
+        title = f"🩹 Map checks: {error_count} errors, {len(issues) - error_count} warnings"
+    with st.expander(title, expanded=False):
+        col_sections, col_severity, col_page = st.columns([1, 1, 1])
+        col_sections.number_input("Sections in the book", min_value=1, value=DEFAULT_SECTIONS, key="book_sections")
+        severities = col_severity.multiselect("Severity", [ERROR, WARNING], default=[ERROR, WARNING])
+        page_filter = col_page.text_input("Page contains").strip()
+        headings = [heading for _, heading in CHECKS.values()]
+        shown_checks = st.multiselect("Checks", headings, default=headings)
+        if issues is None:
+            st.markdown("Checking the map in the background…")
+            return
+        rows = [
+            row for row in (issue.row() for issue in issues)
+            if row["severity"] in severities and row["check"] in shown_checks and page_filter in row["page"]
+        ]
+        if rows:
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+        else:
+            st.markdown("No issues." if not issues else "No issues match the filters.")
+
+
+map_checks()
+timer.lap("validation")
 
 st.markdown("---")
 st.markdown("### 📷 Static Image Export")
 
-if st.button("Export Static Graph as PNG"):
-    G = nx.DiGraph()
-    for edge in st.session_state.edges:
-        if edge["to"] is not None:
-            G.add_edge(edge["from"], edge["to"])
-
-    pos = nx.spring_layout(G, seed=42)
-    plt.figure(figsize=(30, 30))
-    nx.draw(
-        G, pos, with_labels=True,
-        node_size=700, node_color="white",
-        edge_color="black", font_color="black", font_size=10,
-        arrows=True
-    )
-    plt.axis("off")
-    export_path = "static_ff_graph.png"
-    plt.savefig(export_path, dpi=300, bbox_inches='tight', facecolor="white")
-    st.image(export_path, caption="Static Graph Export (matplotlib)")
-    with open(export_path, "rb") as f:
-        st.download_button("⬇️ Download Static Image", f.read(), file_name="ff_graph.png", mime="image/png")
+export_preset = st.selectbox("Format", list(EXPORT_PRESETS))
+if st.button("Export Static Graph"):
+    # Same cached positions as the interactive view (force layout if the browser lays it out).
+    # The graph view's layout radio, read back from its widget state.
+    layout = st.session_state.layouts.get(LAYOUT_CHOICES.get(st.session_state.get("layout_choice"), HIERARCHICAL))
+    export_layout = layout or st.session_state.layouts[FORCE]
+    st.session_state.exporter.submit(graph, export_layout, export_preset)
+    st.session_state.export_request = (graph.version, (export_layout.mode, export_preset))
+
+if st.session_state.get("export_request"):
+    export_version, export_key = st.session_state.export_request
+    job = st.session_state.exporter.jobs.peek(export_version, export_key)
+    fmt = EXPORT_PRESETS[export_key[1]][0]
+    if job is None:
+        st.session_state.export_request = None
+    elif not job.done():
+        st.info("Rendering static image in the background…")
+        st.button("Refresh")
+    elif job.exception() is not None:
+        st.error(f"Static export failed: {job.exception()}")
+        st.session_state.exporter.jobs.discard(export_version, export_key)
+        st.session_state.export_request = None
+    else:
+        image = job.result()
+        if fmt == "png":
+            st.image(image, caption="Static Graph Export (matplotlib)")
+        st.download_button(
+            "⬇️ Download Static Image", image, file_name=f"ff_graph.{fmt}", mime=EXPORT_MIME_TYPES[fmt]
+        )
+timer.lap("static_export")
+
+# --- Diagnostics ---
+timer.count("pages", len(store.pages))
+timer.count("edges", graph.edge_count)
+timer.count("store_rows", len(store))
+timer.count("analytics_pending", analytics.pending())
+timer.count("graph_version", graph.version)
+timer.emit()
+
+
+# --- Background results: rerun the page once a section's job has finished ---
+@st.fragment(run_every=POLL_SECONDS)
+def watch_analytics():
+    if analytics.collect():
+        st.rerun()
+
+
+watch_analytics()
+with st.expander("🩺 Diagnostics", expanded=False):
+    st.table([{"stage": name, "ms": round(sec * 1000, 2)} for name, sec in timer.stages])
+    st.json(timer.counters)
+    st.caption(f"Total script time {timer.total * 1000:.1f} ms.")
+    if profiling_enabled():
+        st.button("Profile next rerun", on_click=arm_profiler)
+    else:
+        st.caption(f"Set {PROFILE_ENV} to capture a cProfile dump of a rerun.")
+profile_path = finish_profiling(profiler)
+if profile_path:
+    st.caption(f"cProfile dump written to `{profile_path}`")
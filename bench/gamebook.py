@@ -0,0 +1,57 @@
+"""Seeded synthetic gamebooks for benchmarking.
+
+A book is a list of sections numbered from 1. Most choices jump forward a
+few sections, some loop back, a share of sections are dead ends, a handful
+hold Required items, and the last section is the End.
+"""
+import random
+
+# name -> (sections, mean choices per section)
+SCALES = {
+    "book": (400, 2.5),
+    "omnibus": (4000, 3.0),
+    "composite": (10000, 3.5),
+    "huge": (24000, 4.0),
+}
+
+
+def generate(sections, mean_choices=2.5, seed=0, dead_ratio=0.08, secret_ratio=0.05,
+             back_ratio=0.1, required=8):
+    """Path-grammar lines (``"12,40,51*,77x"``) for a synthetic book."""
+    rng = random.Random(seed)
+    dead = set(rng.sample(range(2, sections), int(sections * dead_ratio)))
+    items = set(rng.sample([s for s in range(2, sections) if s not in dead], min(required, sections // 4)))
+    lines = []
+    for section in range(1, sections):
+        if section in dead:
+            continue
+        choices = max(1, round(rng.gauss(mean_choices, 1)))
+        targets = set()
+        for _ in range(choices):
+            if rng.random() < back_ratio and section > 10:
+                targets.add(rng.randint(max(1, section - 50), section - 1))
+            else:
+                targets.add(min(sections, section + rng.randint(1, 30)))
+        # Keep the book finishable: always allow stepping to the next live section.
+        step = section + 1
+        while step in dead:
+            step += 1
+        targets.add(step)
+        tokens = ["1s" if section == 1 else str(section)]
+        for target in sorted(targets):
+            token = str(target)
+            if target in items:
+                token += "+"
+            elif target == sections:
+                token += "t"
+            elif target in dead:
+                token += "x"
+            if rng.random() < secret_ratio:
+                token += "*"
+            tokens.append(token)
+        lines.append(",".join(tokens))
+    return lines
+
+
+def paste_text(lines):
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,205 @@
+"""Headless benchmark of the rerun pipeline, one timing per stage.
+
+    python -m bench.run                     # all scales, saved under bench/results/
+    python -m bench.run --scale book --repeat 5
+    python -m bench.run --compare OLD.json NEW.json
+
+Stages whose optional dependency is missing (numpy, pyvis, matplotlib) are recorded
+as skipped rather than failing the run.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from bench.gamebook import SCALES, generate, paste_text
+from ffmapper import EdgeStore, GraphModel
+from ffmapper.analysis import ReachabilityIndex
+from ffmapper.csv_export import csv_text
+from ffmapper.distances import DistanceIndex
+from ffmapper.importer import import_stream
+from ffmapper.parser import parse_text
+from ffmapper.routes import solve_required_route
+from ffmapper.summary import ChainIndex, summarize
+from ffmapper.validate import validate
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# PNG export at the larger scales takes minutes and measures matplotlib only.
+PNG_MAX_EDGES = 5000
+
+
+class Skip(Exception):
+    pass
+
+
+def _build(text):
+    store = EdgeStore()
+    store.extend(parse_text(text).edges)
+    return store, GraphModel(store)
+
+
+def stages(text, csv_data, edge_count):
+    """Ordered ``(name, setup, run)``; ``setup`` returns the argument for ``run``."""
+    def built():
+        return _build(text)
+
+    def shortest_path(state):
+        store, graph = state
+        ends = store.end_nodes()
+        return graph.shortest_page_path(store.first_node, ends[0]) if ends else None
+
+    def odds(state):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            raise Skip("numpy not installed")
+        from ffmapper.odds import success_odds
+
+        graph = state[1]
+        return success_odds(graph, ReachabilityIndex(graph)).method
+
+    def pyvis_html(state):
+        try:
+            import pyvis  # noqa: F401
+        except ImportError:
+            raise Skip("pyvis not installed")
+        from ffmapper.render import render_html
+
+        return len(render_html(state[1]))
+
+    def png(state):
+        if edge_count > PNG_MAX_EDGES:
+            raise Skip(f"more than {PNG_MAX_EDGES} edges")
+        try:
+            import matplotlib  # noqa: F401
+            import networkx  # noqa: F401
+        except ImportError:
+            raise Skip("matplotlib/networkx not installed")
+        from ffmapper.export import render_static
+        from ffmapper.layout import LayoutEngine
+
+        graph = state[1]
+        pages = graph.store.pages
+        edges = [(pages[s], pages[d]) for s, d in graph.edges()]
+        return len(render_static(edges, LayoutEngine(graph).page_positions(flip_y=True), "png", 72, 16))
+
+    return [
+        ("parse", lambda: text, parse_text),
+        ("graph_build", lambda: parse_text(text).edges, lambda edges: GraphModel(_extend(edges))),
+        ("shortest_path", built, shortest_path),
+        ("distance_index", built, lambda state: DistanceIndex(state[1]).refresh()),
+        ("node_tags", built, lambda state: state[0].node_tags()),
+        ("analysis", built, lambda state: ReachabilityIndex(state[1]).refresh()),
+        ("snapshot", built, lambda state: state[1].snapshot()),
+        ("summary", built, lambda state: len(summarize(state[1], ChainIndex(state[1])))),
+        (
+            "validation", built,
+            lambda state: len(validate(state[1], DistanceIndex(state[1]), ReachabilityIndex(state[1]))),
+        ),
+        ("required_route", built, lambda state: solve_required_route(state[1])),
+        ("odds", built, odds),
+        ("pyvis_html", built, pyvis_html),
+        ("csv_export", built, lambda state: len(csv_text(state[0]))),
+        ("csv_import", lambda: csv_data.encode("utf-8"), lambda raw: import_stream(io.BytesIO(raw), EdgeStore())),
+        ("png_export", built, png),
+    ]
+
+
+def _extend(edges):
+    store = EdgeStore()
+    store.extend(edges)
+    return store
+
+
+def run_scale(name, repeat):
+    sections, mean_choices = SCALES[name]
+    text = paste_text(generate(sections, mean_choices, seed=sections))
+    store, graph = _build(text)
+    csv_data = csv_text(store)
+    result = {"sections": sections, "edges": len(store), "pages": len(store.pages), "stages": {}}
+    for stage, setup, run in stages(text, csv_data, len(store)):
+        times = []
+        try:
+            for _ in range(repeat):
+                arg = setup()
+                start = time.perf_counter()
+                run(arg)
+                times.append(time.perf_counter() - start)
+        except Skip as exc:
+            result["stages"][stage] = {"skipped": str(exc)}
+            continue
+        result["stages"][stage] = {"median": statistics.median(times), "min": min(times)}
+    return result
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _print(results):
+    for scale, data in results["scales"].items():
+        print(f"{scale}: {data['pages']} pages, {data['edges']} edges")
+        for stage, timing in data["stages"].items():
+            if "skipped" in timing:
+                print(f"  {stage:<16} skipped ({timing['skipped']})")
+            else:
+                print(f"  {stage:<16} {timing['median'] * 1000:10.2f} ms")
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['commit']} -> {new['commit']}")
+    for scale, data in new["scales"].items():
+        before = old["scales"].get(scale, {}).get("stages", {})
+        print(scale)
+        for stage, timing in data["stages"].items():
+            prev = before.get(stage, {})
+            if "median" not in timing or "median" not in prev:
+                continue
+            ratio = timing["median"] / prev["median"] if prev["median"] else float("inf")
+            print(f"  {stage:<16} {prev['median'] * 1000:10.2f} -> {timing['median'] * 1000:10.2f} ms  x{ratio:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", action="append", choices=sorted(SCALES), help="repeatable; default all")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="results file (default bench/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    results = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "scales": {name: run_scale(name, args.repeat) for name in (args.scale or SCALES)},
+    }
+    _print(results)
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"saved {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
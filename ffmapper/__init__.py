@@ -0,0 +1,4 @@
+from ffmapper.edge_store import EdgeStore, NODE_TAGS
+from ffmapper.graph import GraphModel
+
+__all__ = ["EdgeStore", "GraphModel", "NODE_TAGS"]
@@ -0,0 +1,5 @@
+import sys
+
+from ffmapper.cli import main
+
+sys.exit(main())
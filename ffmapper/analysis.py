@@ -0,0 +1,290 @@
+"""Incrementally maintained reachability facts about a GraphModel."""
+from array import array
+
+from ffmapper.edge_store import TAG_BITS
+
+# Batches larger than this (and larger than what is already indexed) are
+# folded in by a full linear rebuild instead of edge by edge.
+BULK_ROWS = 1000
+
+
+class ReachabilityIndex:
+    """SCCs, condensation DAG, End/Dead reachability and the frontier.
+
+    The index reads store rows the graph has already synced and folds them in
+    one at a time; inserting an edge only touches the part of the graph whose
+    answer actually changes. Bulk loads are indexed with one linear pass.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self._row = 0
+        self._journal = 0
+        self._uf = []
+        self.comp_succ = {}
+        self.comp_pred = {}
+        self.reaches_end = set()
+        self.reaches_dead = set()
+        self.ends = set()
+        self.deads = set()
+        self._expanded = set()
+        self.frontier = set()
+        self.version = -1
+
+    @property
+    def indexed_rows(self):
+        return self._row
+
+    @property
+    def indexed_journal(self):
+        return self._journal
+
+    # --- Maintenance ---
+    def refresh(self):
+        """Fold in everything the graph has synced since the last call."""
+        graph = self.graph
+        if graph.synced_rows < self._row or graph.synced_journal < self._journal:
+            # The store was rolled back; incremental insert cannot undo facts.
+            self.__init__(graph)
+        end = graph.synced_rows
+        journal = graph.synced_journal
+        if end == self._row and journal == self._journal:
+            self.version = graph.version
+            return self
+        if end - self._row > max(BULK_ROWS, self._row) or not (self._row or self._journal):
+            # A fresh index reads page tags from the table: a loaded or
+            # copied store has no journal entries for them.
+            return self._rebuild()
+        store = graph.store
+        self._grow(len(graph.succ))
+        for s, d in zip(store.src[self._row:end], store.dst[self._row:end]):
+            self._expanded.add(s)
+            self.frontier.discard(s)
+            if d not in self._expanded:
+                self.frontier.add(d)
+            if s != d:
+                self._add_edge(s, d)
+        # Node tags only ever gain bits between rollbacks.
+        page_tags = store.page_tags
+        for kind, page, _, _ in store.journal[self._journal:journal]:
+            if kind != "page":
+                continue
+            if page_tags[page] & TAG_BITS["End"] and page not in self.ends:
+                self.ends.add(page)
+                self._mark_back(page, self.reaches_end)
+            if page_tags[page] & TAG_BITS["Dead"] and page not in self.deads:
+                self.deads.add(page)
+                self._mark_back(page, self.reaches_dead)
+        self._row = end
+        self._journal = journal
+        self.version = graph.version
+        return self
+
+    def _rebuild(self):
+        """Recompute everything in linear time; cheaper than folding a big batch."""
+        graph = self.graph
+        store = graph.store
+        end = graph.synced_rows
+        journal = graph.synced_journal
+        self.__init__(graph)
+        n = len(graph.succ)
+        self._uf = _tarjan(graph.succ)
+        for node in range(n):
+            c = self._uf[node]
+            self.comp_succ.setdefault(c, set())
+            self.comp_pred.setdefault(c, set())
+        for s, d in graph.edges():
+            cs, cd = self._uf[s], self._uf[d]
+            if cs != cd:
+                self.comp_succ[cs].add(cd)
+                self.comp_pred[cd].add(cs)
+        for node, bits in zip(range(n), store.page_tags):
+            if bits & TAG_BITS["End"]:
+                self.ends.add(node)
+            if bits & TAG_BITS["Dead"]:
+                self.deads.add(node)
+        for node in self.ends:
+            self._mark_back(node, self.reaches_end)
+        for node in self.deads:
+            self._mark_back(node, self.reaches_dead)
+        self._expanded = set(store.src[:end])
+        self.frontier = set(store.dst[:end]) - self._expanded
+        self._row = end
+        self._journal = journal
+        self.version = graph.version
+        return self
+
+    def snapshot(self):
+        """Compact, immutable copy of the index for ``restore``."""
+        return (
+            self._row,
+            self._journal,
+            array("i", self._uf),
+            {c: frozenset(v) for c, v in self.comp_succ.items() if v},
+            frozenset(self.reaches_end),
+            frozenset(self.reaches_dead),
+            frozenset(self.ends),
+            frozenset(self.deads),
+            frozenset(self._expanded),
+            frozenset(self.frontier),
+        )
+
+    def restore(self, snap):
+        """Return to a snapshot; the next ``refresh`` folds in later rows."""
+        row, journal, uf, comp_succ, reaches_end, reaches_dead, ends, deads, expanded, frontier = snap
+        self._row = row
+        self._journal = journal
+        self._uf = list(uf)
+        self.comp_succ = {c: set() for c in range(len(uf)) if uf[c] == c}
+        self.comp_pred = {c: set() for c in self.comp_succ}
+        for c, targets in comp_succ.items():
+            self.comp_succ[c] = set(targets)
+            for t in targets:
+                self.comp_pred[t].add(c)
+        self.reaches_end = set(reaches_end)
+        self.reaches_dead = set(reaches_dead)
+        self.ends = set(ends)
+        self.deads = set(deads)
+        self._expanded = set(expanded)
+        self.frontier = set(frontier)
+        self.version = -1
+
+    def _grow(self, n):
+        for node in range(len(self._uf), n):
+            self._uf.append(node)
+            self.comp_succ[node] = set()
+            self.comp_pred[node] = set()
+
+    def _mark_back(self, node, marked):
+        """Mark ``node`` and everything that can reach it."""
+        if node in marked:
+            return
+        pred = self.graph.pred
+        marked.add(node)
+        stack = [node]
+        while stack:
+            for prev in pred[stack.pop()]:
+                if prev not in marked:
+                    marked.add(prev)
+                    stack.append(prev)
+
+    def _add_edge(self, s, d):
+        if d in self.reaches_end:
+            self._mark_back(s, self.reaches_end)
+        if d in self.reaches_dead:
+            self._mark_back(s, self.reaches_dead)
+
+        cs, cd = self.find(s), self.find(d)
+        if cs == cd or cd in self.comp_succ[cs]:
+            return
+        self.comp_succ[cs].add(cd)
+        self.comp_pred[cd].add(cs)
+        # The new edge closes a cycle iff cs was already reachable from cd.
+        ahead = self._walk(cd, self.comp_succ)
+        if cs in ahead:
+            behind = self._walk(cs, self.comp_pred)
+            self._merge(ahead & behind)
+
+    @staticmethod
+    def _walk(start, adj):
+        seen = {start}
+        stack = [start]
+        while stack:
+            for nxt in adj[stack.pop()]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return seen
+
+    def _merge(self, comps):
+        rep = min(comps)
+        succ, pred = set(), set()
+        for c in comps:
+            succ |= self.comp_succ.pop(c)
+            pred |= self.comp_pred.pop(c)
+            self._uf[c] = rep
+        succ -= comps
+        pred -= comps
+        for c in succ:
+            self.comp_pred[c] = {rep if p in comps else p for p in self.comp_pred[c]}
+        for c in pred:
+            self.comp_succ[c] = {rep if n in comps else n for n in self.comp_succ[c]}
+        self.comp_succ[rep] = succ
+        self.comp_pred[rep] = pred
+
+    # --- Queries ---
+    def find(self, node):
+        uf = self._uf
+        root = node
+        while uf[root] != root:
+            root = uf[root]
+        while uf[node] != root:
+            uf[node], node = root, uf[node]
+        return root
+
+    def components(self):
+        """Map component id -> list of page ids, for components of size > 1."""
+        groups = {}
+        for node in range(len(self._uf)):
+            groups.setdefault(self.find(node), []).append(node)
+        return {c: nodes for c, nodes in groups.items() if len(nodes) > 1}
+
+    def doomed(self):
+        """Pages that cannot reach any End but can reach a Dead page."""
+        return self.reaches_dead - self.reaches_end
+
+    def page_sets(self):
+        """The analysis as sets of page strings, for rendering and display."""
+        pages = self.graph.store.pages
+        return {
+            "reaches_end": {pages[n] for n in self.reaches_end},
+            "doomed": {pages[n] for n in self.doomed()},
+            "frontier": {pages[n] for n in self.frontier},
+        }
+
+
+def _tarjan(succ):
+    """Iterative Tarjan SCC; returns the component (its smallest node) per node."""
+    n = len(succ)
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    comp = list(range(n))
+    stack = []
+    counter = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, iter(succ[root]))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if index[child] == -1:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack[child] = True
+                    work.append((child, iter(succ[child])))
+                    break
+                if on_stack[child] and index[child] < low[node]:
+                    low[node] = index[child]
+            else:
+                work.pop()
+                if work and low[node] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[node]
+                if low[node] == index[node]:
+                    members = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        members.append(member)
+                        if member == node:
+                            break
+                    rep = min(members)
+                    for member in members:
+                        comp[member] = rep
+    return comp
@@ -0,0 +1,112 @@
+"""Expensive analytics computed on a thread pool, off the Streamlit script thread."""
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+from ffmapper.cache import VersionCache
+
+# Jobs one session may have on the shared pool at once; the rest wait in the
+# session's own queue, so a busy session cannot fill the pool's queue ahead of
+# everyone else's.
+SESSION_JOBS = 1
+
+
+def make_thread_pool(workers=2):
+    from concurrent.futures import ThreadPoolExecutor
+
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ffmapper-analytics")
+
+
+class Analytics:
+    """Per-session handle on background jobs, cached by graph version and key.
+
+    A job runs ``compute(snapshot)`` on ``GraphModel.snapshot()``, taken once
+    per version on the script thread, so it never races the next edit.
+    ``result`` never blocks: it returns None while the job is running, and
+    ``collect`` tells a poller when such a job has since finished. ``pool``
+    is a callable returning the executor, as for ``StaticExporter``.
+
+    At most ``session_jobs`` jobs are handed to the shared pool at a time.
+    Jobs still queued are cancelled once the graph moves to a new version or
+    they age out of ``jobs``; finished results stay cached for an undo.
+    """
+
+    def __init__(self, pool, maxsize=16, session_jobs=SESSION_JOBS):
+        self._pool = pool
+        self.jobs = VersionCache(maxsize=maxsize, on_evict=self._drop)
+        self.session_jobs = session_jobs
+        self._waiting = set()
+        self._version = None
+        self._lock = threading.Lock()
+        self._queue = deque()
+        self._running = 0
+
+    def submit(self, graph, key, compute):
+        if graph.version != self._version:
+            self._cancel_superseded(graph.version)
+
+        def start():
+            snapshot = graph.memo("snapshot", graph.snapshot)
+            job = Future()
+            with self._lock:
+                self._queue.append((job, compute, snapshot))
+            self._dispatch()
+            return job
+
+        return self.jobs.get(graph.version, key, start)
+
+    def result(self, graph, key, compute):
+        """The finished ``compute(snapshot)`` for this version, or None while it runs.
+
+        A job that raised re-raises here and is dropped, so the next call
+        starts it again.
+        """
+        job = self.submit(graph, key, compute)
+        if not job.done():
+            self._waiting.add(job)
+            return None
+        if job.exception() is not None:
+            self.jobs.discard(graph.version, key)
+        return job.result()
+
+    def pending(self):
+        return any(not job.done() for job in self._waiting)
+
+    def collect(self):
+        """True once some job a caller waited on has finished since the last call."""
+        finished = {job for job in self._waiting if job.done()}
+        self._waiting -= finished
+        return bool(finished)
+
+    def _cancel_superseded(self, version):
+        self._version = version
+        for (job_version, key), job in self.jobs.items():
+            if job_version != version and job.cancel():
+                self.jobs.discard(job_version, key)
+                self._waiting.discard(job)
+
+    def _drop(self, job):
+        job.cancel()
+        self._waiting.discard(job)
+
+    def _dispatch(self):
+        """Hand queued jobs to the pool while this session is under its share."""
+        with self._lock:
+            ready = []
+            while self._queue and self._running < self.session_jobs:
+                job, compute, snapshot = self._queue.popleft()
+                if job.set_running_or_notify_cancel():
+                    self._running += 1
+                    ready.append((job, compute, snapshot))
+        for job, compute, snapshot in ready:
+            self._pool().submit(self._run, job, compute, snapshot)
+
+    def _run(self, job, compute, snapshot):
+        try:
+            job.set_result(compute(snapshot))
+        except BaseException as exc:
+            job.set_exception(exc)
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._dispatch()
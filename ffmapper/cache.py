@@ -0,0 +1,55 @@
+"""Small caches keyed by graph version."""
+from collections import OrderedDict
+
+
+class VersionCache:
+    """LRU of results keyed by ``(version, key)``.
+
+    Entries for older versions simply age out; nothing needs to be
+    invalidated explicitly when the graph changes. ``on_evict`` is called
+    with each value that ages out.
+    """
+
+    def __init__(self, maxsize=8, on_evict=None):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, item):
+        return item in self._data
+
+    def get(self, version, key, compute):
+        full_key = (version, key)
+        try:
+            value = self._data[full_key]
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            self._data[full_key] = value
+            if len(self._data) > self.maxsize:
+                _, evicted = self._data.popitem(last=False)
+                if self.on_evict is not None:
+                    self.on_evict(evicted)
+        else:
+            self.hits += 1
+            self._data.move_to_end(full_key)
+        return value
+
+    def peek(self, version, key, default=None):
+        """Cached value without computing or touching LRU order."""
+        return self._data.get((version, key), default)
+
+    def items(self):
+        """``((version, key), value)`` pairs, oldest first."""
+        return list(self._data.items())
+
+    def discard(self, version, key):
+        self._data.pop((version, key), None)
+
+    def clear(self):
+        self._data.clear()
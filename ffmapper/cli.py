@@ -0,0 +1,181 @@
+"""Headless tools: map a directory of books in parallel, merge contributors' maps.
+
+    python -m ffmapper batch books/ -o maps/ --workers 4
+    python -m ffmapper merge alice.csv bob.csv -o merged.csv --report merge.json
+
+In batch mode each ``*.csv`` (exported) or ``*.txt`` (path grammar) file
+becomes ``<name>.html``, ``<name>.<png|svg>`` and ``<name>.report.json`` in the
+output directory. Results are printed as each book finishes.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ffmapper import EdgeStore, GraphModel
+from ffmapper.analysis import ReachabilityIndex
+from ffmapper.importer import import_stream
+from ffmapper.csv_export import write_csv
+from ffmapper.layout import HIERARCHICAL, MODES, LayoutEngine
+from ffmapper.merge import load_csv_maps, merge_maps, merge_report
+from ffmapper.report import book_report
+from ffmapper.storage import DB_ENV, ProjectStore
+
+INPUT_SUFFIXES = (".csv", ".txt")
+
+
+def process_book(path, out_dir, layout_mode=HIERARCHICAL, image="png", dpi=150, route_budget=10.0):
+    """Map one book file; returns a summary dict. Runs in a worker process."""
+    started = time.perf_counter()
+    name = os.path.splitext(os.path.basename(path))[0]
+    store = EdgeStore()
+    with open(path, "rb") as f:
+        imported = import_stream(f, store)
+    graph = GraphModel(store)
+    analysis = ReachabilityIndex(graph)
+    layout = LayoutEngine(graph, layout_mode)
+
+    report = book_report(graph, analysis, route_budget, imported.warnings)
+    report["source"] = path
+    report["format"] = imported.format
+    report["input_errors"] = [e._asdict() for e in imported.errors]
+    report["input_warnings"] = [w._asdict() for w in imported.warnings]
+    outputs = {}
+    skipped = {}
+
+    try:
+        from ffmapper.render import render_html
+
+        html = render_html(graph, analysis=analysis, layout=layout)
+    except ImportError as exc:
+        skipped["html"] = str(exc)
+    else:
+        outputs["html"] = _write(out_dir, f"{name}.html", html.encode("utf-8"))
+
+    if image != "none":
+        try:
+            from ffmapper.export import render_static
+
+            pages = store.pages
+            edges = [(pages[s], pages[d]) for s, d in graph.edges()]
+            data = render_static(edges, layout.page_positions(flip_y=True), image, dpi)
+        except ImportError as exc:
+            skipped["image"] = str(exc)
+        else:
+            outputs["image"] = _write(out_dir, f"{name}.{image}", data)
+
+    report["skipped"] = skipped
+    outputs["report"] = _write(out_dir, f"{name}.report.json", json.dumps(report, indent=2).encode("utf-8"))
+    return {
+        "book": name,
+        "pages": report["pages"],
+        "edges": report["edges"],
+        "outputs": outputs,
+        "skipped": skipped,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _write(out_dir, filename, data):
+    path = os.path.join(out_dir, filename)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def find_books(directory):
+    return sorted(
+        os.path.join(directory, entry)
+        for entry in os.listdir(directory)
+        if entry.lower().endswith(INPUT_SUFFIXES) and os.path.isfile(os.path.join(directory, entry))
+    )
+
+
+def run_batch(books, out_dir, workers=None, **options):
+    """Yield ``(path, summary, error)`` as each book finishes."""
+    os.makedirs(out_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_book, path, out_dir, **options): path for path in books}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                yield path, future.result(), None
+            except Exception as exc:  # a broken book must not stop the batch
+                yield path, None, exc
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ffmapper", description="FF graph mapper tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    batch = sub.add_parser("batch", help="map every .csv/.txt book in a directory")
+    batch.add_argument("input", help="directory of exported CSVs or path files")
+    batch.add_argument("-o", "--output", default="maps", help="output directory (default: maps)")
+    batch.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    batch.add_argument("--layout", choices=MODES, default=HIERARCHICAL)
+    batch.add_argument("--image", choices=("png", "svg", "none"), default="png")
+    batch.add_argument("--dpi", type=int, default=150)
+    batch.add_argument("--route-budget", type=float, default=10.0, help="seconds for the Required route solver")
+    merge = sub.add_parser("merge", help="merge several contributors' maps of one book")
+    merge.add_argument("inputs", nargs="*", help="exported CSVs or path files, one per contributor")
+    merge.add_argument("-p", "--project", action="append", default=[], help="stored project to include (repeatable)")
+    merge.add_argument("--db", default=os.environ.get(DB_ENV), help=f"project database (default: ${DB_ENV})")
+    merge.add_argument("-o", "--output", default="merged.csv", help="merged CSV (default: merged.csv)")
+    merge.add_argument("--report", help="write contributor diffs and conflicts as JSON here")
+    args = parser.parse_args(argv)
+    if args.command == "merge":
+        return run_merge(args)
+
+    books = find_books(args.input)
+    if not books:
+        print(f"no .csv or .txt files in {args.input}", file=sys.stderr)
+        return 1
+    failed = 0
+    for path, summary, error in run_batch(
+        books, args.output, args.workers,
+        layout_mode=args.layout, image=args.image, dpi=args.dpi, route_budget=args.route_budget,
+    ):
+        if error is not None:
+            failed += 1
+            print(f"FAILED {path}: {error}", file=sys.stderr)
+            continue
+        note = f" (skipped: {', '.join(summary['skipped'])})" if summary["skipped"] else ""
+        print(f"{summary['book']}: {summary['pages']} pages, {summary['edges']} edges, "
+              f"{summary['seconds']:.2f}s{note}", flush=True)
+    print(f"{len(books) - failed}/{len(books)} books mapped into {args.output}")
+    return 1 if failed else 0
+
+
+def run_merge(args):
+    if args.project and not args.db:
+        print(f"--project needs --db or ${DB_ENV}", file=sys.stderr)
+        return 1
+    files = []
+    try:
+        for path in args.inputs:
+            files.append((os.path.splitext(os.path.basename(path))[0], open(path, "rb")))
+        maps = load_csv_maps(files)
+    finally:
+        for _, f in files:
+            f.close()
+    if args.project:
+        projects = ProjectStore(args.db)
+        maps += [(name, projects.load(name)) for name in args.project]
+        projects.close()
+    if len(maps) < 2:
+        print("merge needs at least two maps", file=sys.stderr)
+        return 1
+
+    result = merge_maps(maps)
+    with open(args.output, "w", encoding="utf-8", newline="") as f:
+        write_csv(result.union, f)
+    report = merge_report(result)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    for diff in report["diffs"]:
+        print(f"{diff['name']}: {diff['edges']} edges, {diff['unique']} only theirs, {diff['missing']} missing")
+    print(f"{report['edges']} edges, {report['pages']} pages merged into {args.output}; "
+          f"{len(report['edge_conflicts'])} edge and {len(report['page_conflicts'])} page conflicts")
+    return 0
@@ -0,0 +1,32 @@
+"""Stdlib CSV writer for the export schema; no pandas needed."""
+import csv
+import io
+
+from ffmapper.edge_store import CSV_FIELDS
+
+CHUNK_ROWS = 5000
+
+
+def write_csv(store, fileobj, chunk_rows=CHUNK_ROWS):
+    """Stream ``store`` as CSV text into ``fileobj``, ``chunk_rows`` at a time.
+
+    Page tags follow the edges as self-loop rows, so older exports and new
+    ones read back the same way. Returns the number of data rows written.
+    """
+    writer = csv.writer(fileobj, lineterminator="\n")
+    writer.writerow(CSV_FIELDS)
+    for start in range(0, len(store), chunk_rows):
+        writer.writerows(store.iter_edges(start, start + chunk_rows))
+    tag_rows = list(store.iter_tag_rows())
+    writer.writerows(tag_rows)
+    return len(store) + len(tag_rows)
+
+
+def csv_text(store):
+    buf = io.StringIO()
+    write_csv(store, buf)
+    return buf.getvalue()
+
+
+def csv_bytes(store):
+    return csv_text(store).encode("utf-8")
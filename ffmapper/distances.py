@@ -0,0 +1,163 @@
+"""Shortest-path trees from Start and towards the End pages, kept up to date."""
+from collections import deque
+
+from ffmapper.analysis import BULK_ROWS
+from ffmapper.edge_store import TAG_BITS
+
+UNREACHED = -1
+
+
+class DistanceIndex:
+    """BFS tree out of the Start page plus a reverse BFS forest into the Ends.
+
+    ``dist[node]`` / ``parent[node]`` give the distance from Start and the
+    previous page on a shortest route; ``to_end[node]`` / ``next_hop[node]``
+    the distance to the nearest End and the next page towards it. Inserted
+    edges only ever shorten distances, so each new row relaxes the pages whose
+    distance actually drops. Queries then walk the trees in O(path length).
+
+    A rollback, a new Start page or a batch larger than what is indexed is
+    handled by one linear rebuild.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self._row = 0
+        self._journal = 0
+        self._rollbacks = graph.rollbacks
+        self.start = None
+        self.dist = []
+        self.parent = []
+        self.to_end = []
+        self.next_hop = []
+        self.version = -1
+
+    # --- Maintenance ---
+    def refresh(self):
+        """Fold in everything the graph has synced since the last call."""
+        graph = self.graph
+        end = graph.synced_rows
+        journal = graph.synced_journal
+        if graph.rollbacks != self._rollbacks:
+            # Rows seen before may have been replaced, even if as many came back.
+            return self._rebuild()
+        if end == self._row and journal == self._journal:
+            self.version = graph.version
+            return self
+        if (
+            end < self._row or journal < self._journal
+            or end - self._row > max(BULK_ROWS, self._row)
+            or graph.start_id() != self.start
+        ):
+            return self._rebuild()
+        store = graph.store
+        self._grow(len(graph.succ))
+        for s, d in zip(store.src[self._row:end], store.dst[self._row:end]):
+            self._relax_forward(s, d)
+            self._relax_back(s, d)
+        page_tags = store.page_tags
+        end_bit = TAG_BITS["End"]
+        for kind, page, _, _ in store.journal[self._journal:journal]:
+            if kind == "page" and page_tags[page] & end_bit and self.to_end[page]:
+                self._settle_back(deque([page]), page, 0, None)
+        self._row = end
+        self._journal = journal
+        self.version = graph.version
+        return self
+
+    def _rebuild(self):
+        graph = self.graph
+        store = graph.store
+        self.__init__(graph)
+        n = len(graph.succ)
+        self._grow(n)
+        self.start = graph.start_id()
+        if self.start is not None:
+            self._settle_forward(deque([self.start]), self.start, 0, None)
+        ends = deque(node for node, bits in zip(range(n), store.page_tags) if bits & TAG_BITS["End"])
+        for node in ends:
+            self.to_end[node] = 0
+        self._spread_back(ends)
+        self._row = graph.synced_rows
+        self._journal = graph.synced_journal
+        self.version = graph.version
+        return self
+
+    def _grow(self, n):
+        for values, fill in ((self.dist, UNREACHED), (self.parent, None),
+                             (self.to_end, UNREACHED), (self.next_hop, None)):
+            values.extend([fill] * (n - len(values)))
+
+    def _relax_forward(self, s, d):
+        dist = self.dist
+        if dist[s] != UNREACHED and (dist[d] == UNREACHED or dist[s] + 1 < dist[d]):
+            self._settle_forward(deque([d]), d, dist[s] + 1, s)
+
+    def _settle_forward(self, queue, node, distance, parent):
+        self.dist[node] = distance
+        self.parent[node] = parent
+        dist, succ = self.dist, self.graph.succ
+        while queue:
+            node = queue.popleft()
+            step = dist[node] + 1
+            for nxt in succ[node]:
+                if dist[nxt] == UNREACHED or step < dist[nxt]:
+                    dist[nxt] = step
+                    self.parent[nxt] = node
+                    queue.append(nxt)
+
+    def _relax_back(self, s, d):
+        to_end = self.to_end
+        if to_end[d] != UNREACHED and (to_end[s] == UNREACHED or to_end[d] + 1 < to_end[s]):
+            self._settle_back(deque([s]), s, to_end[d] + 1, d)
+
+    def _settle_back(self, queue, node, distance, next_hop):
+        self.to_end[node] = distance
+        self.next_hop[node] = next_hop
+        self._spread_back(queue)
+
+    def _spread_back(self, queue):
+        to_end, pred = self.to_end, self.graph.pred
+        while queue:
+            node = queue.popleft()
+            step = to_end[node] + 1
+            for prev in pred[node]:
+                if to_end[prev] == UNREACHED or step < to_end[prev]:
+                    to_end[prev] = step
+                    self.next_hop[prev] = node
+                    queue.append(prev)
+
+    # --- Queries ---
+    def distance(self, node):
+        """Steps from Start to ``node``, or None if it cannot be reached."""
+        d = self.dist[node] if node < len(self.dist) else UNREACHED
+        return None if d == UNREACHED else d
+
+    def distance_to_end(self, node):
+        """Steps from ``node`` to the nearest End, or None."""
+        d = self.to_end[node] if node < len(self.to_end) else UNREACHED
+        return None if d == UNREACHED else d
+
+    def route_from_start(self, node):
+        """A shortest route Start -> ``node`` as page ids, or None."""
+        if self.distance(node) is None:
+            return None
+        path = [node]
+        while self.parent[path[-1]] is not None:
+            path.append(self.parent[path[-1]])
+        return path[::-1]
+
+    def route_to_end(self, node):
+        """A shortest route ``node`` -> nearest End as page ids, or None."""
+        if self.distance_to_end(node) is None:
+            return None
+        path = [node]
+        while self.next_hop[path[-1]] is not None:
+            path.append(self.next_hop[path[-1]])
+        return path
+
+    def route_via(self, node):
+        """Shortest Start -> ``node`` -> End route, with whichever halves exist."""
+        there = self.route_from_start(node) or [node]
+        onward = self.route_to_end(node) or [node]
+        return there[:-1] + onward
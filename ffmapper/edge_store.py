@@ -0,0 +1,277 @@
+"""Columnar edge storage shared by the parser, renderer, routing and export."""
+from array import array
+
+# Tags understood by the renderer; anything else is kept as a free-form label.
+NODE_TAGS = ("Required", "Dead", "End", "Start")
+
+CSV_FIELDS = ("from", "to", "chosen", "tag", "is_secret")
+
+# Bits in the flags column
+CHOSEN = 1
+SECRET = 2
+
+# Bits in the page tag table
+TAG_BITS = {"Required": 1, "Dead": 2, "End": 4, "Start": 8}
+
+# When the same (from, to) is entered twice the higher-ranked label wins;
+# free-form labels rank above no label and below every node tag.
+TAG_RANK = {"": 0, "Start": 2, "Required": 3, "End": 4, "Dead": 5}
+FREE_FORM_RANK = 1
+
+
+def tag_rank(tag):
+    return TAG_RANK.get(tag, FREE_FORM_RANK)
+
+
+def is_tag_row(from_page, to_page, chosen, tag):
+    """True for the self-loop rows the parser uses to tag a source page."""
+    return from_page == to_page and not chosen and tag in TAG_BITS
+
+
+class EdgeStore:
+    """Deduplicated edge table with interned page ids and a page tag table.
+
+    Pages and tags are interned once; every edge is four small ints spread
+    over ``array`` columns, so scanning tens of thousands of edges does not
+    touch a single dict. Each (from, to) pair has exactly one row, found
+    through ``edge_index``: entering it again merges into that row (a secret
+    flag sticks, the higher-ranked label wins). Node tags are one bitmask per
+    page in ``page_tags``, never rows.
+
+    Rows are only ever appended. In-place changes are recorded in ``journal``
+    as ``(kind, index, old, new)`` so an undo can put them back.
+    """
+
+    def __init__(self):
+        self.pages = []
+        self.page_ids = {}
+        self.page_tags = array("B")
+        self.tags = [""]
+        self.tag_ids = {"": 0}
+        self.src = array("i")
+        self.dst = array("i")
+        self.flags = array("B")
+        self.tag = array("H")
+        self.edge_index = {}
+        self.journal = []
+        # Rows below ``saved_rows`` are saved as they are, apart from those
+        # changed in place since; ``truncate`` lowers it and notes the saved
+        # (from, to) pairs and pages it drops. See ProjectStore.save.
+        self.saved_rows = 0
+        self.dirty_rows = set()
+        self.dirty_pages = set()
+        self.dropped_edges = set()
+        self.dropped_pages = set()
+
+    def __len__(self):
+        return len(self.src)
+
+    def __iter__(self):
+        return self.iter_edges()
+
+    # --- Interning ---
+    def intern(self, page):
+        page_id = self.page_ids.get(page)
+        if page_id is None:
+            page_id = len(self.pages)
+            self.page_ids[page] = page_id
+            self.pages.append(page)
+            self.page_tags.append(0)
+        return page_id
+
+    def intern_tag(self, tag):
+        tag = tag or ""
+        tag_id = self.tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = len(self.tags)
+            self.tag_ids[tag] = tag_id
+            self.tags.append(tag)
+        return tag_id
+
+    # --- Writing ---
+    def append(self, from_page, to_page, chosen=True, tag="", is_secret=False):
+        """Insert or merge one edge; returns its row (None for a page tag)."""
+        tag = tag or ""
+        if is_tag_row(from_page, to_page, chosen, tag):
+            self.add_page_tag(self.intern(from_page), tag)
+            return None
+        s = self.intern(from_page)
+        d = self.intern(to_page)
+        flags = (CHOSEN if chosen else 0) | (SECRET if is_secret else 0)
+        row = self.edge_index.get((s, d))
+        if row is None:
+            row = len(self.src)
+            self.src.append(s)
+            self.dst.append(d)
+            self.flags.append(flags)
+            self.tag.append(self.intern_tag(tag))
+            self.edge_index[s, d] = row
+        else:
+            self._merge(row, flags, tag)
+        if tag in TAG_BITS:
+            self.add_page_tag(d, tag)
+        return row
+
+    def extend(self, edges):
+        """Insert ``(from, to, chosen, tag, is_secret)`` tuples; returns rows appended.
+
+        Same rules as ``append``, with the common case (a new, untagged edge)
+        kept inline.
+        """
+        before = len(self.src)
+        intern, intern_tag, index = self.intern, self.intern_tag, self.edge_index
+        src, dst, flags_col, tag_col = self.src, self.dst, self.flags, self.tag
+        for from_page, to_page, chosen, tag, is_secret in edges:
+            if tag in TAG_BITS:
+                self.append(from_page, to_page, chosen, tag, is_secret)
+                continue
+            s = intern(from_page)
+            d = intern(to_page)
+            flags = (CHOSEN if chosen else 0) | (SECRET if is_secret else 0)
+            row = index.get((s, d))
+            if row is None:
+                index[s, d] = len(src)
+                src.append(s)
+                dst.append(d)
+                flags_col.append(flags)
+                tag_col.append(intern_tag(tag))
+            else:
+                self._merge(row, flags, tag or "")
+        return len(self.src) - before
+
+    def _merge(self, row, flags, tag):
+        old = self.flags[row]
+        if old | flags != old:
+            self._set("flags", row, old | flags)
+        if tag_rank(tag) > tag_rank(self.tags[self.tag[row]]):
+            self._set("tag", row, self.intern_tag(tag))
+
+    def add_page_tag(self, page_id, tag):
+        bits = self.page_tags[page_id]
+        if not bits & TAG_BITS[tag]:
+            self._set("page", page_id, bits | TAG_BITS[tag])
+
+    def _column(self, kind):
+        if kind == "page":
+            return self.page_tags, self.dirty_pages
+        return (self.flags if kind == "flags" else self.tag), self.dirty_rows
+
+    def _set(self, kind, index, value):
+        column, dirty = self._column(kind)
+        self.journal.append((kind, index, column[index], value))
+        column[index] = value
+        dirty.add(index)
+
+    def replay(self, entries):
+        """Apply journal entries again (redo); they are journaled anew."""
+        for kind, index, _, new in entries:
+            self._set(kind, index, new)
+
+    def revert(self, journal_len):
+        """Undo in-place changes made after ``journal_len``; returns them."""
+        undone = self.journal[journal_len:]
+        for kind, index, old, _ in reversed(undone):
+            column, dirty = self._column(kind)
+            column[index] = old
+            dirty.add(index)
+        del self.journal[journal_len:]
+        return undone
+
+    def clear(self):
+        self.__init__()
+
+    def copy(self):
+        """Independent copy of the rows, pages and tags, without journal or dirty marks."""
+        other = EdgeStore()
+        other.pages = list(self.pages)
+        other.page_ids = dict(self.page_ids)
+        other.page_tags = array("B", self.page_tags)
+        other.tags = list(self.tags)
+        other.tag_ids = dict(self.tag_ids)
+        other.src = array("i", self.src)
+        other.dst = array("i", self.dst)
+        other.flags = array("B", self.flags)
+        other.tag = array("H", self.tag)
+        other.edge_index = dict(self.edge_index)
+        return other
+
+    def truncate(self, rows, pages=None):
+        """Drop rows from ``rows`` on, and pages interned after the first ``pages``.
+
+        Costs time proportional to what is removed, not to the store size.
+        """
+        for key in zip(self.src[rows:], self.dst[rows:]):
+            del self.edge_index[key]
+        saved = range(rows, self.saved_rows)
+        self.dropped_edges.update((self.pages[self.src[r]], self.pages[self.dst[r]]) for r in saved)
+        del self.src[rows:]
+        del self.dst[rows:]
+        del self.flags[rows:]
+        del self.tag[rows:]
+        self.saved_rows = min(self.saved_rows, rows)
+        self.dirty_rows = {r for r in self.dirty_rows if r < rows}
+        if pages is not None and pages < len(self.pages):
+            for page in self.pages[pages:]:
+                del self.page_ids[page]
+            self.dropped_pages.update(self.pages[pages:])
+            del self.pages[pages:]
+            del self.page_tags[pages:]
+            self.dirty_pages = {p for p in self.dirty_pages if p < pages}
+
+    # --- Reading ---
+    def edge(self, i):
+        flags = self.flags[i]
+        return (
+            self.pages[self.src[i]],
+            self.pages[self.dst[i]],
+            bool(flags & CHOSEN),
+            self.tags[self.tag[i]],
+            bool(flags & SECRET),
+        )
+
+    def iter_edges(self, start=0, stop=None):
+        pages, tags = self.pages, self.tags
+        stop = len(self.src) if stop is None else min(stop, len(self.src))
+        for i in range(start, stop):
+            flags = self.flags[i]
+            yield (
+                pages[self.src[i]],
+                pages[self.dst[i]],
+                bool(flags & CHOSEN),
+                tags[self.tag[i]],
+                bool(flags & SECRET),
+            )
+
+    def iter_tag_rows(self):
+        """Page tags as the self-loop rows the parser and the CSV format use."""
+        for page, bits in zip(self.pages, self.page_tags):
+            if bits:
+                for tag, bit in TAG_BITS.items():
+                    if bits & bit:
+                        yield page, page, False, tag, False
+
+    def iter_ids(self, start=0):
+        """Yield ``(src_id, dst_id, flags, tag_id)`` without materializing strings."""
+        return zip(self.src[start:], self.dst[start:], self.flags[start:], self.tag[start:])
+
+    @property
+    def first_node(self):
+        return self.pages[self.src[0]] if self.src else None
+
+    def pages_tagged(self, tag):
+        """Ids of the pages carrying node tag ``tag``, in page order."""
+        bit = TAG_BITS[tag]
+        return [p for p, bits in enumerate(self.page_tags) if bits & bit]
+
+    def end_nodes(self):
+        return [self.pages[p] for p in self.pages_tagged("End")]
+
+    def node_tags(self):
+        """Map page -> set of node tags."""
+        names = {bits: {t for t, bit in TAG_BITS.items() if bits & bit} for bits in set(self.page_tags)}
+        return {page: set(names[bits]) for page, bits in zip(self.pages, self.page_tags)}
+
+    def unexplored(self):
+        """Pages that appear as a destination but were never expanded."""
+        seen_from = set(self.src)
+        return {self.pages[d] for d in set(self.dst) - seen_from}
@@ -0,0 +1,76 @@
+"""Static PNG/SVG export rendered off the Streamlit script thread."""
+import io
+
+from ffmapper.cache import VersionCache
+
+# label -> (format, dpi, figure size in inches)
+PRESETS = {
+    "PNG preview (72 dpi)": ("png", 72, 16),
+    "PNG print (300 dpi)": ("png", 300, 30),
+    "SVG": ("svg", 72, 30),
+}
+
+MIME_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def render_static(edges, positions, fmt="png", dpi=300, size=30):
+    """Draw the graph with matplotlib and return the encoded image bytes.
+
+    Runs in a worker process, so it takes plain data: ``edges`` as page pairs
+    and ``positions`` as page -> (x, y).
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
+    G = nx.DiGraph()
+    G.add_nodes_from(positions)
+    G.add_edges_from(edges)
+    fig = plt.figure(figsize=(size, size))
+    try:
+        nx.draw(
+            G, positions, with_labels=True,
+            node_size=700, node_color="white",
+            edge_color="black", font_color="black", font_size=10,
+            arrows=True
+        )
+        plt.axis("off")
+        buf = io.BytesIO()
+        fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches="tight", facecolor="white")
+    finally:
+        plt.close(fig)
+    return buf.getvalue()
+
+
+def make_pool(workers=2):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # spawn: forking a threaded server process is not safe
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+class StaticExporter:
+    """Per-session handle on export jobs, cached by graph version, layout and preset.
+
+    Within a version, jobs are keyed by ``(layout.mode, preset)``.
+
+    ``pool`` is a callable returning the executor, so no worker pool exists
+    until someone actually exports.
+    """
+
+    def __init__(self, pool, maxsize=6):
+        self._pool = pool
+        self.jobs = VersionCache(maxsize=maxsize)
+
+    def submit(self, graph, layout, preset):
+        fmt, dpi, size = PRESETS[preset]
+
+        def start():
+            pages = graph.store.pages
+            edges = [(pages[s], pages[d]) for s, d in graph.edges()]
+            return self._pool().submit(render_static, edges, layout.page_positions(flip_y=True), fmt, dpi, size)
+
+        return self.jobs.get(graph.version, (layout.mode, preset), start)
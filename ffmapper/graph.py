@@ -0,0 +1,215 @@
+"""Persistent adjacency view over an EdgeStore."""
+from collections import deque
+
+
+class GraphModel:
+    """Directed graph kept in sync with an EdgeStore, one delta at a time.
+
+    ``version`` identifies the graph contents: every new state gets a number
+    larger than any seen before, so derived results (paths, renders, analyses)
+    can be cached against it. Rolling back to an earlier state restores that
+    state's number, which lets those caches hit again. ``rollbacks`` counts
+    rollbacks, so readers that follow store rows can tell when rows they
+    already saw may have been replaced.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.succ = []
+        self.pred = []
+        self.edge_count = 0
+        self.version = 0
+        self.rollbacks = 0
+        self._last_version = 0
+        self._synced = 0
+        self._journal = 0
+        self._memo = {}
+        self.sync()
+
+    def __len__(self):
+        return len(self.succ)
+
+    @property
+    def synced_rows(self):
+        """Number of store rows already folded into the graph."""
+        return self._synced
+
+    @property
+    def synced_journal(self):
+        """Length of the store's change journal at the last sync."""
+        return self._journal
+
+    @property
+    def edge_row(self):
+        """(src, dst) -> store row, for edge attributes."""
+        return self.store.edge_index
+
+    def sync(self):
+        """Fold store changes since the last call into the graph.
+
+        New rows are new edges (the store keeps one row per pair); journal
+        entries are merged flags, labels and page tags, which change what is
+        rendered but not the adjacency.
+        """
+        store = self.store
+        end = len(store)
+        journal = len(store.journal)
+        if end == self._synced and journal == self._journal:
+            return False
+        succ, pred = self.succ, self.pred
+        pages = len(store.pages)
+        if pages > len(succ):
+            succ.extend(set() for _ in range(pages - len(succ)))
+            pred.extend(set() for _ in range(pages - len(pred)))
+        for s, d in zip(store.src[self._synced:end], store.dst[self._synced:end]):
+            succ[s].add(d)
+            pred[d].add(s)
+        self.edge_count += end - self._synced
+        self._synced = end
+        self._journal = journal
+        self._bump()
+        return True
+
+    def _bump(self):
+        self._last_version += 1
+        self._changed(self._last_version)
+
+    def restore_version(self, version):
+        """Declare the graph equal to an earlier (or redone) state ``version``."""
+        self._changed(version)
+
+    def _changed(self, version):
+        self.version = version
+        self._memo.clear()
+
+    def rollback(self, rows, version, journal=None):
+        """Forget store rows from ``rows`` on, returning to ``version``.
+
+        Must run before the store itself is truncated; only the rolled-back
+        rows are visited. ``journal`` is the journal length being reverted to.
+        """
+        store = self.store
+        succ, pred = self.succ, self.pred
+        for s, d in zip(store.src[rows:self._synced], store.dst[rows:self._synced]):
+            succ[s].discard(d)
+            pred[d].discard(s)
+        self.edge_count -= max(self._synced - rows, 0)
+        self._synced = min(self._synced, rows)
+        if journal is not None:
+            self._journal = min(self._journal, journal)
+        self.rollbacks += 1
+        self._changed(version)
+
+    def trim_pages(self):
+        """Drop adjacency for pages the store no longer has."""
+        n = len(self.store.pages)
+        del self.succ[n:]
+        del self.pred[n:]
+
+    def snapshot(self):
+        """Frozen copy of the synced graph with the same version.
+
+        Store columns and adjacency sets are copied as they are, nothing is
+        re-derived, so the copy is cheap to take and can be read from
+        another thread while this graph keeps changing.
+        """
+        other = GraphModel.__new__(GraphModel)
+        other.store = self.store.copy()
+        other.succ = [set(targets) for targets in self.succ]
+        other.pred = [set(sources) for sources in self.pred]
+        other.edge_count = self.edge_count
+        other.version = self.version
+        other._last_version = self._last_version
+        other.rollbacks = 0
+        other._synced = self._synced
+        other._journal = 0
+        other._memo = {}
+        return other
+
+    def memo(self, key, compute):
+        """Return ``compute()`` cached until the next graph change."""
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    # --- Queries ---
+    def edges(self):
+        for s, targets in enumerate(self.succ):
+            for d in targets:
+                yield s, d
+
+    def shortest_path(self, source, target):
+        """Unweighted shortest path between page ids, or None."""
+        if source == target:
+            return [source]
+        parent = {source: None}
+        queue = deque([source])
+        succ = self.succ
+        while queue:
+            node = queue.popleft()
+            for nxt in succ[node]:
+                if nxt in parent:
+                    continue
+                parent[nxt] = node
+                if nxt == target:
+                    path = [nxt]
+                    while parent[path[-1]] is not None:
+                        path.append(parent[path[-1]])
+                    return path[::-1]
+                queue.append(nxt)
+        return None
+
+    def bfs(self, source, reverse=False):
+        """Distances and BFS parents from ``source`` (towards it if ``reverse``)."""
+        adj = self.pred if reverse else self.succ
+        dist = {source: 0}
+        parent = {source: None}
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            step = dist[node] + 1
+            for nxt in adj[node]:
+                if nxt not in dist:
+                    dist[nxt] = step
+                    parent[nxt] = node
+                    queue.append(nxt)
+        return dist, parent
+
+    def ego(self, center, radius):
+        """Pages within ``radius`` hops of ``center`` in either direction.
+
+        Returns ``(nodes, boundary)`` where ``boundary`` holds the pages on the
+        rim that still have neighbours outside ``nodes``.
+        """
+        succ, pred = self.succ, self.pred
+        nodes = {center}
+        rim = [center]
+        for _ in range(radius):
+            nxt = []
+            for node in rim:
+                for other in succ[node] | pred[node]:
+                    if other not in nodes:
+                        nodes.add(other)
+                        nxt.append(other)
+            rim = nxt
+        boundary = {n for n in rim if not (succ[n] | pred[n]) <= nodes}
+        return nodes, boundary
+
+    def page_ids_tagged(self, tag):
+        """Page ids carrying node tag ``tag``."""
+        return self.memo(("tagged", tag), lambda: self.store.pages_tagged(tag))
+
+    def start_id(self):
+        """The page tagged Start, else the first page ever entered."""
+        starts = self.page_ids_tagged("Start")
+        if starts:
+            return starts[0]
+        first = self.store.first_node
+        return None if first is None else self.store.page_ids[first]
+
+    def shortest_page_path(self, from_page, to_page):
+        ids = self.store.page_ids
+        if from_page not in ids or to_page not in ids:
+            return None
+        path = self.shortest_path(ids[from_page], ids[to_page])
+        return None if path is None else [self.store.pages[p] for p in path]
@@ -0,0 +1,134 @@
+"""Streaming import of exported CSV files and path-grammar files."""
+import csv
+import io
+
+from ffmapper.edge_store import CSV_FIELDS, is_tag_row
+from ffmapper.parser import MarkWarning, ParseError, parse_line
+
+CHUNK_ROWS = 5000
+
+TRUE_VALUES = frozenset(("true", "1", "yes", "y", "t"))
+
+
+class ImportResult:
+    def __init__(self, fmt):
+        self.format = fmt
+        self.lines = 0
+        self.added = 0
+        self.duplicates = 0
+        self.errors = []
+        self.warnings = []
+
+
+def _as_bool(value):
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def detect_format(first_line):
+    """``"csv"`` for the exported schema, ``"paths"`` for the path grammar."""
+    header = [h.strip().lower() for h in first_line.lstrip("\ufeff").split(",")]
+    return "csv" if header[:2] == ["from", "to"] else "paths"
+
+
+def _csv_edges(lines, header, result):
+    columns = [h.strip().lower() for h in next(csv.reader([header]))]
+    missing = [f for f in CSV_FIELDS[:2] if f not in columns]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+    index = {name: columns.index(name) for name in CSV_FIELDS if name in columns}
+    i_from, i_to = index["from"], index["to"]
+    i_chosen, i_tag, i_secret = index.get("chosen"), index.get("tag"), index.get("is_secret")
+    width = max(index.values()) + 1
+    for lineno, row in enumerate(csv.reader(lines), 2):
+        result.lines += 1
+        if not row:
+            continue
+        if len(row) < width:
+            result.errors.append(ParseError(lineno, ",".join(row), "too few columns"))
+            continue
+        from_page, to_page = row[i_from].strip(), row[i_to].strip()
+        if not from_page or not to_page:
+            result.errors.append(ParseError(lineno, ",".join(row), "empty page"))
+            continue
+        yield (
+            from_page,
+            to_page,
+            True if i_chosen is None else _as_bool(row[i_chosen]),
+            "" if i_tag is None or row[i_tag] == "nan" else row[i_tag].strip(),
+            False if i_secret is None else _as_bool(row[i_secret]),
+        )
+
+
+def _path_edges(lines, first_line, result):
+    tokens = {}
+    found = []
+    for lineno, line in enumerate(_chain(first_line, lines), 1):
+        if not line.strip():
+            continue
+        result.lines += 1
+        try:
+            yield from parse_line(line, tokens, found)
+        except ValueError as exc:
+            result.errors.append(ParseError(lineno, line.rstrip("\r\n"), str(exc)))
+            # The line is skipped, so its pages never reach the map.
+            found.clear()
+        if found:
+            line = line.rstrip("\r\n")
+            result.warnings.extend(MarkWarning(lineno, line, page, message) for page, message in found)
+            found.clear()
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def import_stream(fileobj, store, progress=None, chunk_rows=CHUNK_ROWS):
+    """Append edges read from ``fileobj`` to ``store`` chunk by chunk.
+
+    ``fileobj`` may be binary or text. Edges already in the store (or earlier
+    in the same file) are merged into the existing row and counted as
+    duplicates. ``progress(bytes_read)`` is called
+    after every chunk when given.
+    """
+    raw = fileobj
+    wrapped = not isinstance(fileobj, io.TextIOBase)
+    if wrapped:
+        fileobj = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    lines = iter(fileobj)
+    first_line = next(lines, "")
+    fmt = detect_format(first_line)
+    result = ImportResult(fmt)
+    if fmt == "csv":
+        edges = _csv_edges(lines, first_line, result)
+    else:
+        edges = _path_edges(lines, first_line, result)
+
+    batch = []
+    for edge in edges:
+        batch.append(edge)
+        if len(batch) >= chunk_rows:
+            _insert(store, batch, result)
+            batch = []
+            if progress is not None:
+                progress(_position(raw))
+    _insert(store, batch, result)
+    if progress is not None:
+        progress(_position(raw))
+    if wrapped:
+        # Leave the caller's file open.
+        fileobj.detach()
+    return result
+
+
+def _insert(store, batch, result):
+    added = store.extend(batch)
+    result.added += added
+    result.duplicates += sum(not is_tag_row(*edge[:4]) for edge in batch) - added
+
+
+def _position(raw):
+    try:
+        return raw.tell()
+    except (OSError, ValueError):
+        return 0
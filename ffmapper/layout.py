@@ -0,0 +1,165 @@
+"""Server-side node layouts, computed once per graph version."""
+import random
+from collections import deque
+
+HIERARCHICAL = "hierarchical"
+FORCE = "force"
+MODES = (HIERARCHICAL, FORCE)
+
+NODE_GAP = 120
+LAYER_GAP = 150
+FORCE_SCALE = 90
+
+# Relayout from scratch when more than this share of the nodes is new.
+RELAYOUT_RATIO = 0.5
+
+
+class LayoutEngine:
+    """Keeps positions for one layout mode and extends them as the graph grows.
+
+    ``positions`` maps page id -> ``(x, y)`` in vis.js pixel coordinates
+    (y grows downwards).
+    """
+
+    def __init__(self, graph, mode=HIERARCHICAL, seed=42):
+        if mode not in MODES:
+            raise ValueError(f"unknown layout mode: {mode}")
+        self.graph = graph
+        self.mode = mode
+        self.seed = seed
+        self.positions = {}
+        self.version = -1
+        self._slots = {}
+
+    def update(self):
+        graph = self.graph
+        if self.version == graph.version:
+            return self.positions
+        n = len(graph.succ)
+        if len(self.positions) > n:
+            # Pages were rolled back (undo); keep everyone else where they are.
+            for node in range(n, len(self.positions)):
+                del self.positions[node]
+        missing = n - len(self.positions)
+        if not self.positions or missing > RELAYOUT_RATIO * n:
+            self._full_layout()
+        elif missing:
+            self._place_new(range(len(self.positions), n))
+        self.version = graph.version
+        return self.positions
+
+    def page_positions(self, flip_y=False):
+        """Positions keyed by page string; ``flip_y`` for matplotlib axes."""
+        pages = self.graph.store.pages
+        sign = -1 if flip_y else 1
+        return {pages[n]: (x, sign * y) for n, (x, y) in self.update().items()}
+
+    # --- Full layouts ---
+    def _full_layout(self):
+        if self.mode == HIERARCHICAL:
+            self._hierarchical()
+        else:
+            self._force()
+
+    def _depths(self):
+        """BFS depth from Start; pages Start cannot reach hang from their own roots."""
+        graph = self.graph
+        n = len(graph.succ)
+        depth = {}
+        roots = [graph.start_id()] if n else []
+        roots += [v for v in range(n) if not graph.pred[v]]
+        roots += range(n)
+        for root in roots:
+            if root is None or root in depth:
+                continue
+            depth[root] = 0
+            queue = deque([root])
+            while queue:
+                node = queue.popleft()
+                for nxt in graph.succ[node]:
+                    if nxt not in depth:
+                        depth[nxt] = depth[node] + 1
+                        queue.append(nxt)
+        return depth
+
+    def _hierarchical(self):
+        graph = self.graph
+        depth = self._depths()
+        layers = {}
+        for node in sorted(depth, key=depth.get):
+            layers.setdefault(depth[node], []).append(node)
+        slot_of = {}
+        self._slots = {}
+        for level in sorted(layers):
+            # Order each layer by the mean slot of already placed parents.
+            def barycenter(node):
+                placed = [slot_of[p] for p in graph.pred[node] if p in slot_of]
+                return sum(placed) / len(placed) if placed else float("inf")
+
+            row = sorted(layers[level], key=barycenter)
+            offset = len(row) // 2
+            taken = self._slots.setdefault(level, set())
+            for i, node in enumerate(row):
+                slot = i - offset
+                slot_of[node] = slot
+                taken.add(slot)
+        self.positions = {n: (slot_of[n] * NODE_GAP, depth[n] * LAYER_GAP) for n in slot_of}
+
+    def _force(self):
+        import networkx as nx
+
+        graph = self.graph
+        G = nx.DiGraph()
+        G.add_nodes_from(range(len(graph.succ)))
+        G.add_edges_from(graph.edges())
+        scale = FORCE_SCALE * max(len(G), 1) ** 0.5
+        pos = nx.spring_layout(G, seed=self.seed, scale=scale)
+        self.positions = {n: (float(x), float(y)) for n, (x, y) in pos.items()}
+
+    # --- Incremental placement ---
+    def _place_new(self, nodes):
+        graph = self.graph
+        rng = random.Random(self.seed + len(self.positions))
+        pending = deque(nodes)
+        stalled = 0
+        while pending:
+            node = pending.popleft()
+            anchors = [self.positions[p] for p in graph.pred[node] | graph.succ[node] if p in self.positions]
+            if not anchors and stalled < len(pending):
+                # Wait until a neighbour has been placed.
+                pending.append(node)
+                stalled += 1
+                continue
+            stalled = 0
+            if self.mode == HIERARCHICAL:
+                self.positions[node] = self._free_slot(node, anchors)
+            else:
+                self.positions[node] = self._near(anchors, rng)
+
+    def _free_slot(self, node, anchors):
+        graph = self.graph
+        parents = [self.positions[p] for p in graph.pred[node] if p in self.positions]
+        if parents:
+            level = round(min(y for _, y in parents) / LAYER_GAP) + 1
+            want = round(sum(x for x, _ in parents) / len(parents) / NODE_GAP)
+        elif anchors:
+            level = round(min(y for _, y in anchors) / LAYER_GAP) - 1
+            want = round(anchors[0][0] / NODE_GAP)
+        else:
+            level = max(self._slots, default=-1) + 1
+            want = 0
+        taken = self._slots.setdefault(level, set())
+        for step in range(len(taken) + 1):
+            for slot in (want + step, want - step):
+                if slot not in taken:
+                    taken.add(slot)
+                    return slot * NODE_GAP, level * LAYER_GAP
+        raise AssertionError("unreachable")
+
+    def _near(self, anchors, rng):
+        if not anchors:
+            xs = [x for x, _ in self.positions.values()] or [0.0]
+            return max(xs) + NODE_GAP, 0.0
+        cx = sum(x for x, _ in anchors) / len(anchors)
+        cy = sum(y for _, y in anchors) / len(anchors)
+        return cx + rng.uniform(-1, 1) * NODE_GAP / 2, cy + rng.uniform(-1, 1) * NODE_GAP / 2
@@ -0,0 +1,169 @@
+"""Live vis.js view: the browser keeps its DataSets and is sent only what changed.
+
+The frontend in ``frontend/index.html`` is a static Streamlit component
+speaking the component postMessage protocol directly, so there is nothing to
+build. Each rerun passes it one ``LiveGraph.update`` payload; node clicks
+come back as the component value.
+"""
+import os
+import uuid
+
+from ffmapper.render import DEFAULT_STYLE, GRAPH_HEIGHT, edge_options, node_options
+from ffmapper.summary import summary_records
+
+FRONTEND_DIR = os.path.join(os.path.dirname(__file__), "frontend")
+
+
+def view_options(style=DEFAULT_STYLE, physics=True):
+    """Static settings of the live view; small enough to send every rerun."""
+    opts = dict(style)
+    return {
+        "background": opts["bgcolor"],
+        "height": GRAPH_HEIGHT,
+        "network": {
+            "nodes": {"shape": "dot", "font": {"color": opts["font_color"]}},
+            "edges": {"arrows": "to"},
+            "physics": {"enabled": physics},
+            "interaction": {"hover": True},
+        },
+    }
+
+
+class LiveGraph:
+    """What one browser view holds, and the updates that bring it up to date.
+
+    ``update`` returns the nodes and edges that changed since the previous
+    payload, numbered ``base`` -> ``seq``. Edges are followed through new
+    store rows and journal entries, so they cost O(change). Node colours
+    depend on whole-map analysis, so pages are restyled once per graph
+    version (or colouring/route change) and only differing ones are sent.
+    A browser that holds some other ``seq`` (a reloaded page) sends a
+    ``resync`` event and the next payload carries everything.
+
+    Every LiveGraph has its own ``epoch``, carried by its payloads and
+    echoed in the browser's events, so a view started over for another
+    book neither mistakes its numbering nor acts on a click meant for the
+    old one.
+
+    ``update_summary`` does the same for a collapsed ``Summary`` view, whose
+    records are diffed by vis id.
+    """
+
+    def __init__(self, graph, style=DEFAULT_STYLE):
+        self.graph = graph
+        self.style = style
+        self.epoch = uuid.uuid4().hex
+        self.seq = 0
+        self.nodes = {}
+        self.edges = {}
+        self.full = True
+        self._row = 0
+        self._journal = 0
+        self._rollbacks = graph.rollbacks
+        self._key = None
+        self._mode = None
+        self._route = set()
+        self._event = None
+
+    def update(self, analysis=None, layout=None, odds=None, highlight=()):
+        """Payload for the frontend: changed nodes/edges plus ids to remove."""
+        graph = self.graph
+        store = graph.store
+        pages = store.pages
+        mode = None if layout is None else layout.mode
+        # Positions live on the nodes; another layout replaces all of them.
+        reset = self.full or mode != self._mode
+        if reset:
+            self.nodes.clear()
+            self.edges.clear()
+            self._key = None
+
+        end, journal = graph.synced_rows, graph.synced_journal
+        route = set(zip(highlight, highlight[1:]))
+        removed_edges = []
+        if reset or graph.rollbacks != self._rollbacks or end < self._row or journal < self._journal:
+            rows = range(end)
+            removed_edges = [row for row in self.edges if row >= end]
+            for row in removed_edges:
+                del self.edges[row]
+        else:
+            rows = set(range(self._row, end))
+            rows.update(index for kind, index, _, _ in store.journal[self._journal:journal] if kind != "page")
+            moved = (graph.edge_row.get(pair, end) for pair in route ^ self._route)
+            rows.update(row for row in moved if row < end)
+        edges = []
+        opts = dict(self.style)
+        src, dst = store.src, store.dst
+        for row in rows:
+            s, d = src[row], dst[row]
+            record = {"id": row, "from": pages[s], "to": pages[d], **edge_options(store, row, opts, (s, d) in route)}
+            if self.edges.get(row) != record:
+                self.edges[row] = record
+                edges.append(record)
+
+        nodes = []
+        removed_nodes = []
+        key = (graph.version, None if odds is None else odds.player, tuple(highlight))
+        if key != self._key:
+            positions = None if layout is None else layout.update()
+            for node, record in node_options(graph, analysis, positions=positions, odds=odds, highlight=highlight):
+                record["id"] = pages[node]
+                old = self.nodes.get(node)
+                if old != record:
+                    if old is not None and old["id"] != record["id"]:
+                        removed_nodes.append(old["id"])
+                    self.nodes[node] = record
+                    nodes.append(record)
+            for node in [node for node in self.nodes if node >= len(graph.succ)]:
+                removed_nodes.append(self.nodes.pop(node)["id"])
+
+        self._row, self._journal, self._rollbacks = end, journal, graph.rollbacks
+        self._key, self._mode, self._route = key, mode, route
+        return self._payload(reset, nodes, edges, removed_nodes, removed_edges)
+
+    def update_summary(self, summary, analysis=None, layout=None, odds=None, highlight=()):
+        """Payload for a ``Summary`` view, computed once per summary, colouring and route."""
+        mode = ("summary", None if layout is None else layout.mode)
+        reset = self.full or mode != self._mode
+        key = (summary, None if odds is None else odds.player, tuple(highlight))
+        if reset:
+            self.nodes.clear()
+            self.edges.clear()
+        elif key == self._key:
+            return self._payload(False, [], [], [], [])
+        positions = None if layout is None else layout.update()
+        nodes, edges = summary_records(self.graph, summary, analysis, positions, odds, highlight, self.style)
+        removed_nodes = [vis_id for vis_id in self.nodes if vis_id not in nodes]
+        removed_edges = [vis_id for vis_id in self.edges if vis_id not in edges]
+        changed_nodes = [record for vis_id, record in nodes.items() if self.nodes.get(vis_id) != record]
+        changed_edges = [record for vis_id, record in edges.items() if self.edges.get(vis_id) != record]
+        self.nodes, self.edges = nodes, edges
+        self._key, self._mode = key, mode
+        return self._payload(reset, changed_nodes, changed_edges, removed_nodes, removed_edges)
+
+    def _payload(self, reset, nodes, edges, removed_nodes, removed_edges):
+        base = self.seq
+        if reset or nodes or edges or removed_nodes or removed_edges:
+            self.seq += 1
+        self.full = False
+        return {
+            "epoch": self.epoch,
+            "base": base,
+            "seq": self.seq,
+            "reset": reset,
+            "nodes": nodes,
+            "edges": edges,
+            "removed_nodes": removed_nodes,
+            "removed_edges": removed_edges,
+        }
+
+    def handle(self, event):
+        """Act on a new component value once; returns the clicked page or None."""
+        if not event or event == self._event:
+            return None
+        self._event = event
+        if event.get("event") == "resync":
+            self.full = True
+        elif event.get("event") == "click" and event.get("epoch") == self.epoch:
+            return event.get("page")
+        return None
@@ -0,0 +1,204 @@
+"""Merge the maps of several contributors into one, with their disagreements."""
+from ffmapper.edge_store import CHOSEN, SECRET, TAG_BITS, EdgeStore
+
+
+class EdgeConflict:
+    """Contributors disagree on the label or secret flag of one edge.
+
+    ``variants`` maps ``(tag, is_secret)`` to the names that entered it.
+    """
+
+    def __init__(self, from_page, to_page, variants):
+        self.from_page = from_page
+        self.to_page = to_page
+        self.variants = variants
+
+
+class PageConflict:
+    """Contributors who know a page disagree on its node tags.
+
+    ``variants`` maps a sorted tuple of tags to the names that gave it.
+    """
+
+    def __init__(self, page, variants):
+        self.page = page
+        self.variants = variants
+
+
+class ContributorDiff:
+    def __init__(self, name, edges, unique, missing, unique_pages, missing_pages):
+        self.name = name
+        self.edges = edges
+        self.unique = unique
+        self.missing = missing
+        self.unique_pages = unique_pages
+        self.missing_pages = missing_pages
+
+
+class MergeResult:
+    """Union of N contributors' maps plus who contributed what.
+
+    ``union`` is an EdgeStore built with the store's own merge rules (a secret
+    flag sticks, the higher-ranked label wins). ``edge_owners[row]`` and
+    ``page_owners[page_id]`` are bitmasks over ``names``.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.union = EdgeStore()
+        self.edge_owners = []
+        self.page_owners = []
+        self.edge_conflicts = {}
+        self.page_conflicts = {}
+
+    def _owners(self, mask):
+        return [name for i, name in enumerate(self.names) if mask >> i & 1]
+
+    def conflicts(self):
+        """Edge conflicts, then page conflicts, with contributor names."""
+        pages = self.union.pages
+        edges = [
+            EdgeConflict(pages[self.union.src[row]], pages[self.union.dst[row]], {
+                (self.union.tags[tag], bool(secret)): self._owners(mask)
+                for (tag, secret), mask in variants.items()
+            })
+            for row, variants in sorted(self.edge_conflicts.items())
+        ]
+        tags = [
+            PageConflict(pages[page], {_tag_names(bits): self._owners(mask) for bits, mask in variants.items()})
+            for page, variants in sorted(self.page_conflicts.items())
+        ]
+        return edges, tags
+
+    def diffs(self):
+        """One ``ContributorDiff`` per contributor, from a single pass over the owner masks."""
+        n = len(self.names)
+        counts = [[0, 0] for _ in range(n)]
+        page_counts = [[0, 0] for _ in range(n)]
+        for owners, table in ((self.edge_owners, counts), (self.page_owners, page_counts)):
+            for mask in owners:
+                if mask & (mask - 1) == 0:
+                    table[mask.bit_length() - 1][1] += 1
+                while mask:
+                    low = mask & -mask
+                    table[low.bit_length() - 1][0] += 1
+                    mask ^= low
+        total_edges, total_pages = len(self.edge_owners), len(self.page_owners)
+        return [
+            ContributorDiff(
+                name, edges, unique, total_edges - edges, unique_pages, total_pages - pages,
+            )
+            for name, (edges, unique), (pages, unique_pages) in zip(self.names, counts, page_counts)
+        ]
+
+    def only_in(self, index):
+        """Edges (as tuples) that only contributor ``index`` has."""
+        bit = 1 << index
+        return [self.union.edge(row) for row, mask in enumerate(self.edge_owners) if mask == bit]
+
+    def missing_from(self, index):
+        """Edges others have that contributor ``index`` lacks."""
+        bit = 1 << index
+        return [self.union.edge(row) for row, mask in enumerate(self.edge_owners) if not mask & bit]
+
+
+def _tag_names(bits):
+    return tuple(sorted(tag for tag, bit in TAG_BITS.items() if bits & bit))
+
+
+def merge_maps(contributors):
+    """Merge ``(name, EdgeStore)`` pairs in one pass over their rows.
+
+    Every edge and page is looked up by hash in the union as it streams by,
+    so the cost is linear in the total number of rows, however many
+    contributors there are.
+    """
+    contributors = list(contributors)
+    result = MergeResult(name for name, _ in contributors)
+    union = result.union
+    edge_owners, page_owners = result.edge_owners, result.page_owners
+    edge_conflicts, page_conflicts = result.edge_conflicts, result.page_conflicts
+    # First value seen per union row / page; variants only once they differ.
+    first_edge = []
+    first_page = []
+
+    index, union_flags, union_tag = union.edge_index, union.flags, union.tag
+    for i, (_, store) in enumerate(contributors):
+        bit = 1 << i
+        page_map = []
+        for page, bits in zip(store.pages, store.page_tags):
+            page_id = union.intern(page)
+            page_map.append(page_id)
+            if page_id == len(page_owners):
+                page_owners.append(0)
+                first_page.append(bits)
+            page_owners[page_id] |= bit
+            if page_id in page_conflicts:
+                variants = page_conflicts[page_id]
+                variants[bits] = variants.get(bits, 0) | bit
+            elif bits != first_page[page_id]:
+                page_conflicts[page_id] = {first_page[page_id]: page_owners[page_id] & ~bit, bits: bit}
+            for tag, tag_bit in TAG_BITS.items():
+                if bits & tag_bit:
+                    union.add_page_tag(page_id, tag)
+
+        pages, tags = store.pages, store.tags
+        tag_map = [union.intern_tag(tag) for tag in tags]
+        for s, d, flags, t in store.iter_ids():
+            row = index.get((page_map[s], page_map[d]))
+            if row is None or union_flags[row] | flags != union_flags[row] or union_tag[row] != tag_map[t]:
+                row = union.append(pages[s], pages[d], bool(flags & CHOSEN), tags[t], bool(flags & SECRET))
+            value = (tag_map[t], flags & SECRET)
+            if row == len(edge_owners):
+                edge_owners.append(0)
+                first_edge.append(value)
+            edge_owners[row] |= bit
+            if row in edge_conflicts:
+                variants = edge_conflicts[row]
+                variants[value] = variants.get(value, 0) | bit
+            elif value != first_edge[row]:
+                edge_conflicts[row] = {first_edge[row]: edge_owners[row] & ~bit, value: bit}
+    # Union page tags were journaled one by one; nothing here is undoable.
+    union.journal.clear()
+    return result
+
+
+def load_csv_maps(files):
+    """``(name, EdgeStore)`` for each ``(name, fileobj)`` of an exported CSV or path file."""
+    from ffmapper.importer import import_stream
+
+    maps = []
+    for name, fileobj in files:
+        store = EdgeStore()
+        import_stream(fileobj, store)
+        maps.append((name, store))
+    return maps
+
+
+def merge_report(result):
+    """Plain-data summary of a merge for JSON output."""
+    edge_conflicts, page_conflicts = result.conflicts()
+    return {
+        "contributors": result.names,
+        "pages": len(result.union.pages),
+        "edges": len(result.union),
+        "diffs": [vars(diff) for diff in result.diffs()],
+        "edge_conflicts": [
+            {
+                "from": c.from_page,
+                "to": c.to_page,
+                "variants": [
+                    {"tag": tag, "is_secret": secret, "contributors": names}
+                    for (tag, secret), names in c.variants.items()
+                ],
+            }
+            for c in edge_conflicts
+        ],
+        "page_conflicts": [
+            {
+                "page": c.page,
+                "variants": [{"tags": list(tags), "contributors": names} for tags, names in c.variants.items()],
+            }
+            for c in page_conflicts
+        ],
+    }
@@ -0,0 +1,275 @@
+"""Chance of reaching an End or a Dead page from every page (needs NumPy).
+
+The book is read as an absorbing Markov chain: End, Dead and unexplored
+pages absorb, every other page moves to one of its successors. A random
+player picks uniformly; a smart player skips successors known to be Dead or
+doomed whenever another choice exists.
+"""
+import time
+
+from ffmapper.edge_store import TAG_BITS
+
+RANDOM = "random"
+SMART = "smart"
+PLAYERS = (RANDOM, SMART)
+
+DEFAULT_BUDGET = 2.0
+TOLERANCE = 1e-10
+MAX_ITERATIONS = 5000
+BREAKDOWN = 1e-10
+
+# Monte Carlo fallback: walkers per page (capped in total) and walk length.
+WALKERS = 64
+MAX_WALKERS = 100000
+MAX_STEPS = 5000
+
+
+class Odds:
+    """Per-page arrays indexed by page id.
+
+    ``end`` and ``dead`` are absorption probabilities; whatever is left over
+    is the chance of ending on an unexplored page or looping forever.
+    ``steps`` is the expected number of choices until absorption, NaN where
+    absorption is not certain. ``method`` is ``"solved"`` or ``"monte-carlo"``.
+    """
+
+    def __init__(self, player, end, dead, steps, method):
+        self.player = player
+        self.end = end
+        self.dead = dead
+        self.steps = steps
+        self.method = method
+
+    def page(self, node):
+        """``(p_end, p_dead, steps)`` of one page as plain floats."""
+        return float(self.end[node]), float(self.dead[node]), float(self.steps[node])
+
+
+def describe(p_end, p_dead, steps):
+    """Tooltip text for one page's odds."""
+    text = f"End {p_end:.0%} · Dead {p_dead:.0%}"
+    if steps == steps and steps > 0:
+        text += f" · ~{steps:.1f} steps"
+    return text
+
+
+def _chain(graph, analysis, player):
+    """Transition edges ``(src, dst, weight)`` out of transient pages, plus masks."""
+    import numpy as np
+
+    store = graph.store
+    n = len(graph.succ)
+    bits = np.frombuffer(store.page_tags, dtype=np.uint8)[:n]
+    dead = (bits & TAG_BITS["Dead"]) != 0
+    end = ((bits & TAG_BITS["End"]) != 0) & ~dead
+    out_degree = np.fromiter((len(t) for t in graph.succ), dtype=np.int64, count=n)
+    absorbing = dead | end | (out_degree == 0)
+
+    src = np.fromiter((s for s, _ in graph.edges()), dtype=np.int64, count=graph.edge_count)
+    dst = np.fromiter((d for _, d in graph.edges()), dtype=np.int64, count=graph.edge_count)
+    keep = ~absorbing[src]
+    if player == SMART:
+        bad = dead.copy()
+        doomed = list(analysis.refresh().doomed())
+        bad[doomed] = True
+        good = ~bad[dst]
+        has_good = np.bincount(src, weights=good, minlength=n) > 0
+        keep &= good | ~has_good[src]
+    src, dst = src[keep], dst[keep]
+    weight = 1.0 / np.bincount(src, minlength=n)[src]
+    return src, dst, weight, end, dead, absorbing
+
+
+def _ranges(starts, counts):
+    """Concatenated ``arange(start, start + count)`` for every pair, vectorized."""
+    import numpy as np
+
+    total = int(counts.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    shift = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return shift + np.arange(total)
+
+
+def _reaches(targets, src, dst, allowed):
+    """Mask of ``allowed`` pages with a chain path into ``targets`` (targets included)."""
+    import numpy as np
+
+    n = len(targets)
+    order = np.argsort(dst, kind="stable")
+    sources = src[order]
+    degree = np.bincount(dst, minlength=n)
+    offsets = np.cumsum(degree) - degree
+    seen = targets.copy()
+    front = np.flatnonzero(targets)
+    while len(front):
+        prev = sources[_ranges(offsets[front], degree[front])]
+        prev = np.unique(prev[allowed[prev] & ~seen[prev]])
+        seen[prev] = True
+        front = prev
+    return seen
+
+
+def _bicgstab(matvec, b, deadline, tol=TOLERANCE, max_iter=MAX_ITERATIONS):
+    """Solve ``matvec(x) == b``; None if it does not converge by ``deadline``.
+
+    On a (near) breakdown the shadow residual is reset to the true residual,
+    the usual restart; convergence is confirmed on the true residual too.
+    """
+    import numpy as np
+
+    norm = np.linalg.norm
+    x = np.zeros_like(b)
+    norm_b = norm(b)
+    if not norm_b:
+        return x
+    r = b.copy()
+    restart = True
+    for i in range(max_iter):
+        if i % 16 == 15 and time.perf_counter() > deadline:
+            break
+        if restart:
+            r = b - matvec(x)
+            if norm(r) < tol * norm_b:
+                return x
+            r_hat = r.copy()
+            rho = alpha = omega = 1.0
+            v = p = np.zeros_like(b)
+            restart = False
+        rho_next = r_hat @ r
+        if abs(rho_next) < BREAKDOWN * norm(r_hat) * norm(r):
+            restart = True
+            continue
+        p = r + (rho_next / rho) * (alpha / omega) * (p - omega * v)
+        v = matvec(p)
+        denominator = r_hat @ v
+        if abs(denominator) < BREAKDOWN * norm(r_hat) * norm(v):
+            restart = True
+            continue
+        alpha = rho_next / denominator
+        s = r - alpha * v
+        if norm(s) < tol * norm_b:
+            x = x + alpha * p
+            restart = True
+            continue
+        t = matvec(s)
+        t_norm = t @ t
+        omega = (t @ s) / t_norm if t_norm else 0.0
+        x = x + alpha * p + omega * s
+        r = s - omega * t
+        rho = rho_next
+        if not omega or norm(r) < tol * norm_b:
+            restart = True
+    return None
+
+
+def _solve_on(mask, src, dst, weight, rhs, deadline):
+    """Solve ``x = rhs + P x`` for the pages in ``mask``; x is 0 elsewhere.
+
+    Only valid when every page in ``mask`` can leave it, which keeps
+    ``I - P`` nonsingular on the subsystem.
+    """
+    import numpy as np
+
+    n = len(mask)
+    nodes = np.flatnonzero(mask)
+    index = np.full(n, -1)
+    index[nodes] = np.arange(len(nodes))
+    inner = mask[src] & mask[dst]
+    q_src, q_dst, q_weight = index[src[inner]], index[dst[inner]], weight[inner]
+    m = len(nodes)
+
+    def matvec(x):
+        return x - np.bincount(q_src, weights=q_weight * x[q_dst], minlength=m)
+
+    x = _bicgstab(matvec, rhs[nodes], deadline)
+    if x is None:
+        return None
+    full = np.zeros(n)
+    full[nodes] = x
+    return full
+
+
+def _solved(src, dst, weight, end, dead, absorbing, deadline):
+    import numpy as np
+
+    transient = ~absorbing
+    # Pages stuck in a loop with no way out never absorb; leaving them out
+    # keeps the systems nonsingular.
+    escapes = _reaches(absorbing, src, dst, transient) & transient
+    trapped = transient & ~escapes
+    certain = transient & ~_reaches(trapped, src, dst, transient)
+    from_transient = escapes[src]
+
+    def one_step_into(target):
+        hit = from_transient & target[dst]
+        return np.bincount(src[hit], weights=weight[hit], minlength=len(end))
+
+    p_end = _solve_on(escapes, src, dst, weight, one_step_into(end), deadline)
+    if p_end is None:
+        return None
+    p_dead = _solve_on(escapes, src, dst, weight, one_step_into(dead), deadline)
+    if p_dead is None:
+        return None
+    steps = _solve_on(certain, src, dst, weight, np.ones(len(end)), deadline)
+    if steps is None:
+        return None
+    # Expected steps are only finite where absorption is certain.
+    steps[trapped | (transient & ~certain)] = np.nan
+    return np.clip(p_end + end, 0, 1), np.clip(p_dead + dead, 0, 1), steps
+
+
+def _monte_carlo(src, dst, end, dead, absorbing, deadline, seed):
+    """Batched random walks: every walker advances one step per array operation.
+
+    Walks still running at the deadline count towards neither End nor Dead.
+    """
+    import numpy as np
+
+    n = len(end)
+    rng = np.random.default_rng(seed)
+    targets = dst[np.argsort(src, kind="stable")]
+    degree = np.bincount(src, minlength=n)
+    offsets = np.cumsum(degree) - degree
+
+    walkers = max(1, min(WALKERS, MAX_WALKERS // max(n, 1)))
+    origin = np.repeat(np.arange(n), walkers)
+    pos = origin.copy()
+    steps = np.zeros(len(pos))
+    active = np.flatnonzero(~absorbing[pos])
+    for i in range(MAX_STEPS):
+        if not len(active) or (i % 16 == 15 and time.perf_counter() > deadline):
+            break
+        here = pos[active]
+        pick = offsets[here] + (rng.random(len(active)) * degree[here]).astype(np.int64)
+        pos[active] = targets[pick]
+        steps[active] += 1
+        active = active[~absorbing[pos[active]]]
+
+    p_end = np.bincount(origin, weights=end[pos], minlength=n) / walkers
+    p_dead = np.bincount(origin, weights=dead[pos], minlength=n) / walkers
+    finished = np.bincount(origin, weights=absorbing[pos], minlength=n) == walkers
+    mean_steps = np.bincount(origin, weights=steps, minlength=n) / walkers
+    return p_end, p_dead, np.where(finished, mean_steps, np.nan)
+
+
+def success_odds(graph, analysis, player=RANDOM, budget=DEFAULT_BUDGET, method="auto", seed=0):
+    """``Odds`` for every page of ``graph``.
+
+    The absorbing chain's linear systems are solved with BiCGSTAB, each
+    sparse matrix-vector product being one ``bincount`` over the edge arrays.
+    When that does not converge within ``budget`` seconds (long loops with
+    rare exits), or with ``method="monte-carlo"``, the odds are estimated
+    from batched random walks given another ``budget`` seconds.
+    """
+    if player not in PLAYERS:
+        raise ValueError(f"unknown player: {player}")
+    src, dst, weight, end, dead, absorbing = _chain(graph, analysis, player)
+    result = None
+    if method != "monte-carlo":
+        result = _solved(src, dst, weight, end, dead, absorbing, time.perf_counter() + budget)
+    if result is not None:
+        return Odds(player, *result, "solved")
+    deadline = time.perf_counter() + budget
+    return Odds(player, *_monte_carlo(src, dst, end, dead, absorbing, deadline, seed), "monte-carlo")
+
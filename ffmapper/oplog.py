@@ -0,0 +1,153 @@
+"""Append-only operation log with undo/redo for a session's map."""
+from contextlib import contextmanager
+
+# Take an analysis snapshot after every this many operations.
+SNAPSHOT_EVERY = 20
+# Keep at most this many; older ones are thinned out so their spacing grows with age.
+MAX_SNAPSHOTS = 8
+
+
+class Operation:
+    __slots__ = (
+        "label", "start", "end", "journal_start", "journal_end",
+        "pages_before", "version_before", "version_after", "pages", "rows", "changes",
+    )
+
+    def __init__(self, label, start, journal_start, pages_before, version_before):
+        self.label = label
+        self.start = start
+        self.end = start
+        self.journal_start = journal_start
+        self.journal_end = journal_start
+        self.pages_before = pages_before
+        self.version_before = version_before
+        self.version_after = version_before
+        # Filled in while the operation is undone, so redo can replay it.
+        self.pages = None
+        self.rows = None
+        self.changes = None
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __bool__(self):
+        return self.end > self.start or self.journal_end > self.journal_start
+
+
+class OpLog:
+    """Records every add as a row range plus a journal range of the store.
+
+    Undo reverts the operation's in-place merges, then drops its rows from the
+    store and the graph; redo appends the rows and replays the merges. Either
+    costs time proportional to the operation, never to the size of the map.
+    The reachability index is rolled back from the nearest periodic snapshot
+    instead of being rebuilt from scratch; at most ``max_snapshots`` are kept.
+    """
+
+    def __init__(self, graph, analysis=None, snapshot_every=SNAPSHOT_EVERY, max_snapshots=MAX_SNAPSHOTS):
+        self.graph = graph
+        self.store = graph.store
+        self.analysis = analysis
+        self.snapshot_every = snapshot_every
+        self.max_snapshots = max_snapshots
+        self.ops = []
+        self.head = 0
+        self.snapshots = []
+
+    @property
+    def can_undo(self):
+        return self.head > 0
+
+    @property
+    def can_redo(self):
+        return self.head < len(self.ops)
+
+    def undo_label(self):
+        return self.ops[self.head - 1].label if self.can_undo else None
+
+    def redo_label(self):
+        return self.ops[self.head].label if self.can_redo else None
+
+    @contextmanager
+    def operation(self, label):
+        """Group everything appended to the store inside the block into one op."""
+        self._drop_redo()
+        self.graph.sync()
+        store = self.store
+        op = Operation(label, len(store), len(store.journal), len(store.pages), self.graph.version)
+        try:
+            yield op
+        finally:
+            self.graph.sync()
+            op.end = len(store)
+            op.journal_end = len(store.journal)
+            op.version_after = self.graph.version
+            if op:
+                self.ops.append(op)
+                self.head += 1
+                self._maybe_snapshot()
+
+    def record(self, label, edges):
+        """Insert ``edges`` as one operation; returns the number of rows added."""
+        with self.operation(label):
+            return self.store.extend(edges)
+
+    def undo(self):
+        if not self.can_undo:
+            return None
+        op = self.ops[self.head - 1]
+        store = self.store
+        op.pages = store.pages[op.pages_before:]
+        op.rows = list(store.iter_edges(op.start, op.end))
+        self.graph.rollback(op.start, op.version_before, op.journal_start)
+        op.changes = store.revert(op.journal_start)
+        store.truncate(op.start, op.pages_before)
+        self.graph.trim_pages()
+        self._rollback_analysis(op.start, op.journal_start)
+        self.head -= 1
+        return op
+
+    def redo(self):
+        if not self.can_redo:
+            return None
+        op = self.ops[self.head]
+        store = self.store
+        # Rows carry their final flags and labels; replaying the journal in
+        # order ends on the same values, and restores the merges and page tags.
+        op.journal_start = len(store.journal)
+        for page in op.pages:
+            store.intern(page)
+        store.extend(op.rows)
+        store.replay(op.changes)
+        op.journal_end = len(store.journal)
+        op.pages = op.rows = op.changes = None
+        self.graph.sync()
+        self.graph.restore_version(op.version_after)
+        self.head += 1
+        return op
+
+    def _drop_redo(self):
+        if self.can_redo:
+            del self.ops[self.head:]
+            rows, journal = len(self.store), len(self.store.journal)
+            self.snapshots = [s for s in self.snapshots if s[0] <= rows and s[1] <= journal]
+
+    def _maybe_snapshot(self):
+        if self.analysis is not None and self.head % self.snapshot_every == 0:
+            self.analysis.refresh()
+            self.snapshots.append(self.analysis.snapshot())
+            if len(self.snapshots) > self.max_snapshots:
+                # Drop every other snapshot in the older half: recent undos
+                # stay cheap, deep ones still restore from an earlier point.
+                del self.snapshots[1:len(self.snapshots) // 2:2]
+
+    def _rollback_analysis(self, rows, journal):
+        analysis = self.analysis
+        if analysis is None or (analysis.indexed_rows <= rows and analysis.indexed_journal <= journal):
+            return
+        while self.snapshots and (self.snapshots[-1][0] > rows or self.snapshots[-1][1] > journal):
+            self.snapshots.pop()
+        if self.snapshots:
+            analysis.restore(self.snapshots[-1])
+        else:
+            analysis.__init__(self.graph)
@@ -0,0 +1,114 @@
+"""Parser for the path grammar: ``from,to,to*,tox,...`` one path per line.
+
+Suffix marks on a page number:
+    *  secret path (dashed edge)
+    x  dead end
+    t  End
+    +  Required
+    s  Start
+"""
+from collections import namedtuple
+
+SUFFIX_CHARS = "*xt+s"
+
+# Checked in this order; the first mark present wins.
+TAG_MARKS = (("+", "Required"), ("t", "End"), ("x", "Dead"), ("s", "Start"))
+
+ParseError = namedtuple("ParseError", "lineno line message")
+# A token whose marks were partly dropped; ``page`` is what made it onto the map.
+MarkWarning = namedtuple("MarkWarning", "lineno line page message")
+
+
+class ParseResult:
+    def __init__(self):
+        self.edges = []
+        self.errors = []
+        self.warnings = []
+        self.lines = 0
+
+    def __bool__(self):
+        return bool(self.edges)
+
+
+def parse_token(token):
+    """Split a token into ``(page, tag, is_secret)``."""
+    page = token.rstrip(SUFFIX_CHARS)
+    marks = token[len(page):]
+    tag = ""
+    if marks:
+        for mark, name in TAG_MARKS:
+            if mark in marks:
+                tag = name
+                break
+    return page, tag, "*" in marks
+
+
+def mark_warning(token):
+    """Why ``parse_token`` drops some of ``token``'s marks, or None if it keeps them all."""
+    page = token.rstrip(SUFFIX_CHARS)
+    marks = token[len(page):]
+    tags = [name for mark, name in TAG_MARKS if mark in marks]
+    if len(tags) > 1:
+        return f"'{token}' has conflicting marks; kept {tags[0]}, dropped {', '.join(tags[1:])}"
+    repeated = "".join(mark for mark in SUFFIX_CHARS if marks.count(mark) > 1)
+    if repeated:
+        return f"'{token}' repeats the mark {repeated!r}"
+    return None
+
+
+def _parse_parts(parts, tokens, warnings):
+    parsed = []
+    for raw in parts:
+        token = tokens.get(raw)
+        if token is None:
+            token = tokens[raw] = parse_token(raw)
+        if not token[0]:
+            raise ValueError(f"'{raw}' has no page number")
+        if warnings is not None and len(raw) - len(token[0]) > 1:
+            problem = mark_warning(raw)
+            if problem:
+                warnings.append((token[0], problem))
+        parsed.append(token)
+
+    from_page, from_tag, from_secret = parsed[0]
+    edges = []
+    if from_tag:
+        # A tag on the source page travels as a self-loop row; the store
+        # files it in its page tag table.
+        edges.append((from_page, from_page, False, from_tag, from_secret))
+    edges.extend((from_page, page, True, tag, is_secret) for page, tag, is_secret in parsed[1:])
+    return edges
+
+
+def parse_line(line, _tokens=None, warnings=None):
+    """Edges for a single path line; raises ValueError if it is malformed.
+
+    ``(page, message)`` for every token with conflicting or repeated marks
+    is appended to ``warnings`` when given.
+    """
+    parts = [p.strip() for p in line.split(",") if p.strip()]
+    if len(parts) < 2:
+        raise ValueError("need at least a from-page and one destination")
+    return _parse_parts(parts, {} if _tokens is None else _tokens, warnings)
+
+
+def parse_text(text):
+    """Parse a whole paste in one pass, collecting edges, per-line errors and mark warnings."""
+    result = ParseResult()
+    edges = result.edges
+    tokens = {}
+    found = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        result.lines += 1
+        try:
+            edges.extend(parse_line(line, tokens, found))
+        except ValueError as exc:
+            result.errors.append(ParseError(lineno, line, str(exc)))
+            # The line is skipped, so its pages never reach the map.
+            found.clear()
+        if found:
+            result.warnings.extend(MarkWarning(lineno, line, page, message) for page, message in found)
+            found.clear()
+    return result
@@ -0,0 +1,98 @@
+"""Per-rerun stage timing, size counters and an opt-in cProfile capture."""
+import cProfile
+import json
+import logging
+import os
+import time
+
+# Path of a .prof file (or a directory to put one in) for one profiled rerun.
+PROFILE_ENV = "FF_MAPPER_PROFILE"
+# File for the JSON timing lines, or "-" for stderr.
+TIMING_LOG_ENV = "FF_MAPPER_TIMING_LOG"
+
+log = logging.getLogger("ffmapper.timing")
+
+_profiled = False
+
+
+class RerunTimer:
+    """Collects ``(stage, seconds)`` laps and counters for one script run.
+
+    ``lap(name)`` closes the stage that started at the previous lap, which
+    keeps a linear script readable.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.counters = {}
+        self._start = self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.stages.append((name, now - self._last))
+        self._last = now
+
+    def count(self, name, value):
+        self.counters[name] = value
+
+    @property
+    def total(self):
+        return time.perf_counter() - self._start
+
+    def as_dict(self):
+        return {
+            "total_ms": round(self.total * 1000, 3),
+            "stages_ms": {name: round(sec * 1000, 3) for name, sec in self.stages},
+            "counters": dict(self.counters),
+        }
+
+    def emit(self):
+        """Write one structured log line for this rerun."""
+        log.info(json.dumps(self.as_dict(), sort_keys=True))
+
+
+def configure_log():
+    """Attach a handler for the timing log if ``FF_MAPPER_TIMING_LOG`` is set (idempotent)."""
+    target = os.environ.get(TIMING_LOG_ENV)
+    if not target or log.handlers:
+        return
+    handler = logging.StreamHandler() if target == "-" else logging.FileHandler(target)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+
+
+def profiling_enabled():
+    return bool(os.environ.get(PROFILE_ENV))
+
+
+def arm_profiler():
+    """Profile the next rerun again."""
+    global _profiled
+    _profiled = False
+
+
+def start_profiling():
+    """Start cProfile for one rerun if ``FF_MAPPER_PROFILE`` is set.
+
+    That is the first rerun in the process, then any rerun after ``arm_profiler``.
+    """
+    global _profiled
+    if not os.environ.get(PROFILE_ENV) or _profiled:
+        return None
+    _profiled = True
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def finish_profiling(profiler):
+    if profiler is None:
+        return None
+    profiler.disable()
+    target = os.environ[PROFILE_ENV]
+    if os.path.isdir(target):
+        target = os.path.join(target, time.strftime("rerun-%Y%m%d-%H%M%S.prof"))
+    profiler.dump_stats(target)
+    log.info("cProfile dump written to %s", target)
+    return target
@@ -0,0 +1,163 @@
+"""pyvis rendering of a GraphModel, entirely in memory."""
+from ffmapper.edge_store import SECRET
+from ffmapper.odds import describe
+
+GRAPH_HEIGHT = 1000
+HIGHLIGHT_COLOR = "#ffd700"
+# vis.js default border; sent explicitly, see ``node_options``.
+BORDER_WIDTH = 1
+
+DEFAULT_STYLE = (
+    ("bgcolor", "#111"),
+    ("font_color", "white"),
+    ("edge_color", "gray"),
+    ("edge_width", 2),
+)
+
+
+def odds_color(p_end):
+    """Red (certain death) through amber to green (certain End)."""
+    red = round(200 * min(1.0, 2 * (1 - p_end)))
+    green = round(200 * min(1.0, 2 * p_end))
+    return f"#{red:02x}{green:02x}50"
+
+
+def node_style(page, tags, first_node, unexplored, doomed=(), odds=None):
+    """Return ``(color, title)`` for a page from its tags.
+
+    With ``odds`` (``(p_end, p_dead, steps)``), untagged pages are coloured by
+    their chance of reaching an End and every tooltip shows the odds.
+    """
+    color, title = _tag_style(page, tags, first_node, unexplored, doomed)
+    if odds is None:
+        return color, title
+    if color in ("#97C2FC", "#a05050"):
+        color = odds_color(odds[0])
+    return color, f"{title}\n{describe(*odds)}".strip()
+
+
+def _tag_style(page, tags, first_node, unexplored, doomed):
+    if "Dead" in tags:
+        return "red", "Dead End"
+    if "End" in tags:
+        return "#00cc88", "End"
+    if "Required" in tags:
+        return "yellow", "Required"
+    if "Start" in tags or page == first_node:
+        return "#007733", "Start"
+    if page in unexplored:
+        return "orange", ""
+    if page in doomed:
+        return "#a05050", "Doomed: cannot reach an End"
+    return "#97C2FC", ""
+
+
+def build_network(graph, style=DEFAULT_STYLE, analysis=None, nodes=None, boundary=(), layout=None, odds=None,
+                  highlight=()):
+    """pyvis Network for the whole graph, or only the page ids in ``nodes``.
+
+    Pages in ``boundary`` are drawn as expandable: they have neighbours that
+    were left out of this view. With a ``layout`` engine, nodes are pinned to
+    its precomputed positions and browser physics is switched off. ``odds``
+    (see ``ffmapper.odds``) colours pages by their chance of success.
+    ``highlight`` is a route of page ids drawn in gold.
+    """
+    from pyvis.network import Network
+
+    opts = dict(style)
+    pages = graph.store.pages
+    net = Network(
+        height=f"{GRAPH_HEIGHT}px", width="100%",
+        bgcolor=opts["bgcolor"], font_color=opts["font_color"], directed=True,
+    )
+    positions = None
+    if layout is not None:
+        positions = layout.update()
+        net.toggle_physics(False)
+
+    for node, options in node_options(graph, analysis, nodes, boundary, positions, odds, highlight):
+        net.add_node(pages[node], **options)
+    route_edges = set(zip(highlight, highlight[1:]))
+    for s in (range(len(graph.succ)) if nodes is None else nodes):
+        for d in graph.succ[s]:
+            if nodes is not None and d not in nodes:
+                continue
+            row = graph.edge_row[s, d]
+            net.add_edge(pages[s], pages[d], **edge_options(graph.store, row, opts, (s, d) in route_edges))
+    return net
+
+
+def node_options(graph, analysis=None, nodes=None, boundary=(), positions=None, odds=None, highlight=()):
+    """``(node, vis.js options)`` per page id, shared by pyvis and the live view."""
+    store = graph.store
+    pages = store.pages
+    node_tags = graph.memo("node_tags", store.node_tags)
+    first_node = store.first_node
+    if analysis is not None:
+        facts = graph.memo("page_sets", lambda: analysis.refresh().page_sets())
+        unexplored, doomed = facts["frontier"], facts["doomed"]
+    else:
+        unexplored, doomed = graph.memo("unexplored", store.unexplored), ()
+    on_route = set(highlight)
+    inside = nodes
+    for node in (range(len(graph.succ)) if nodes is None else nodes):
+        page = pages[node]
+        color, title = node_style(
+            page, node_tags[page], first_node, unexplored, doomed, None if odds is None else odds.page(node)
+        )
+        # Every style key is always present: the live view merges updates
+        # into the nodes it holds, so a key left out would stay on the canvas.
+        options = {
+            "label": page, "color": color, "title": title,
+            "borderWidth": BORDER_WIDTH, "shapeProperties": {"borderDashes": False},
+        }
+        if positions is not None:
+            options["x"], options["y"] = positions[node]
+        if node in boundary:
+            hidden = len((graph.succ[node] | graph.pred[node]) - inside)
+            options.update(
+                label=f"{page} …", title=f"{title}\n{hidden} hidden neighbours, focus here to expand".strip(),
+                borderWidth=3, shapeProperties={"borderDashes": [4, 4]},
+            )
+        elif node in on_route:
+            options.update(borderWidth=4, color={"background": color, "border": HIGHLIGHT_COLOR})
+        yield node, options
+
+
+def edge_options(store, row, opts, highlighted=False):
+    """vis.js options of the edge in store ``row``; ``opts`` is the style as a dict."""
+    return {
+        "color": HIGHLIGHT_COLOR if highlighted else opts["edge_color"],
+        "width": opts["edge_width"] * 2 if highlighted else opts["edge_width"],
+        "title": store.tags[store.tag[row]],
+        "dashes": bool(store.flags[row] & SECRET),
+    }
+
+
+def render_html(graph, style=DEFAULT_STYLE, analysis=None, nodes=None, boundary=(), layout=None, odds=None,
+                highlight=()):
+    """Full pyvis HTML document as a string; nothing is written to disk."""
+    net = build_network(graph, style, analysis, nodes, boundary, layout, odds, highlight)
+    return net.generate_html(notebook=False)
+
+
+def _player(odds):
+    return None if odds is None else odds.player
+
+
+def cached_ego_html(cache, graph, page, radius, style=DEFAULT_STYLE, analysis=None, layout=None, odds=None,
+                    highlight=()):
+    """HTML for the ``radius``-hop neighbourhood of ``page``, memoized in ``cache``.
+
+    Keyed by graph version, page, radius, style, layout, odds player and
+    route. ``odds`` are taken as computed (they may come from a background
+    job) and must belong to the current graph version.
+    """
+    highlight = tuple(highlight)
+
+    def compute():
+        nodes, boundary = graph.ego(graph.store.page_ids[page], radius)
+        return render_html(graph, style, analysis, nodes, boundary, layout, odds, highlight)
+
+    mode = layout.mode if layout is not None else None
+    return cache.get(graph.version, ("ego", page, radius, style, mode, _player(odds), highlight), compute)
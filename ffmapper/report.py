@@ -0,0 +1,51 @@
+"""Plain-data summary of a mapped book, shared by the CLI and exports."""
+from ffmapper.distances import DistanceIndex
+from ffmapper.routes import solve_required_route
+from ffmapper.validate import validate
+
+
+def book_report(graph, analysis, route_budget=None, marks=()):
+    """Dict with sizes, routes and reachability facts, keyed by page strings.
+
+    ``marks`` (parser ``MarkWarning``s) are listed among the issues.
+    """
+    store = graph.store
+    pages = store.pages
+    analysis.refresh()
+    start = graph.start_id()
+    ends = graph.page_ids_tagged("End")
+
+    shortest = None
+    if start is not None and ends:
+        dist, parent = graph.bfs(start)
+        reachable = [e for e in ends if e in dist]
+        if reachable:
+            node = min(reachable, key=dist.get)
+            path = [node]
+            while parent[path[-1]] is not None:
+                path.append(parent[path[-1]])
+            shortest = [pages[p] for p in reversed(path)]
+
+    report = {
+        "pages": len(pages),
+        "edges": graph.edge_count,
+        "start": None if start is None else pages[start],
+        "ends": [pages[e] for e in ends],
+        "required": [pages[r] for r in graph.page_ids_tagged("Required")],
+        "dead": [pages[d] for d in graph.page_ids_tagged("Dead")],
+        "shortest_path": shortest,
+        "doomed": sorted(pages[n] for n in analysis.doomed()),
+        "unexplored": sorted(pages[n] for n in analysis.frontier),
+        "loops": len(analysis.components()),
+        "issues": [issue.row() for issue in validate(graph, DistanceIndex(graph), analysis, marks=marks)],
+    }
+    if report["required"]:
+        kwargs = {} if route_budget is None else {"budget": route_budget}
+        route = solve_required_route(graph, **kwargs)
+        report["required_route"] = {
+            "path": None if route.path is None else [pages[p] for p in route.path],
+            "optimal": route.optimal,
+            "unreachable": [pages[p] for p in route.unreachable],
+            "reason": route.reason,
+        }
+    return report
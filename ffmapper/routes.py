@@ -0,0 +1,432 @@
+"""Route search over a GraphModel."""
+import heapq
+import itertools
+import time
+from collections import deque
+
+from ffmapper.edge_store import SECRET
+
+# Above this many Required pages the exact DP (2^k * k^2) is not attempted.
+MAX_EXACT_REQUIRED = 16
+
+DEFAULT_BUDGET = 2.0
+
+# Stop counting routes one by one (cyclic maps) after this many.
+MAX_COUNTED_ROUTES = 1000000
+
+
+class RequiredRoute:
+    """Result of ``solve_required_route``; ``path`` is None when there is none."""
+
+    def __init__(self, path=None, order=(), optimal=True, unreachable=(), reason=""):
+        self.path = path
+        self.order = list(order)
+        self.optimal = optimal
+        self.unreachable = list(unreachable)
+        self.reason = reason
+
+    @property
+    def length(self):
+        return None if self.path is None else len(self.path) - 1
+
+
+def _bfs(succ, source, stop):
+    """Like ``GraphModel.bfs``, but pages in ``stop`` are reached and never left."""
+    dist = {source: 0}
+    parent = {source: None}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        if node in stop:
+            continue
+        step = dist[node] + 1
+        for nxt in succ[node]:
+            if nxt not in dist:
+                dist[nxt] = step
+                parent[nxt] = node
+                queue.append(nxt)
+    return dist, parent
+
+
+def _walk(parent, target):
+    path = [target]
+    while parent[path[-1]] is not None:
+        path.append(parent[path[-1]])
+    return path[::-1]
+
+
+def solve_required_route(graph, budget=DEFAULT_BUDGET):
+    """Shortest Start -> End route (page ids) visiting every Required page.
+
+    Pairwise distances between Start, Required and End pages come from one
+    BFS per key page; the visiting order is then solved with a bitmask DP.
+    End and Dead pages finish a route, so the BFS never goes past them.
+    If the DP would not fit in ``budget`` seconds, a nearest-neighbour order
+    is returned instead and ``optimal`` is False.
+    """
+    deadline = time.perf_counter() + budget
+    start = graph.start_id()
+    ends = set(graph.page_ids_tagged("End"))
+    if start is None:
+        return RequiredRoute(reason="no Start page")
+    if not ends:
+        return RequiredRoute(reason="no End page")
+    required = [r for r in graph.page_ids_tagged("Required") if r != start and r not in ends]
+
+    keys = [start] + required
+    stop = ends | set(graph.page_ids_tagged("Dead"))
+    trees = [_bfs(graph.succ, k, stop) for k in keys]
+    unreachable = [r for r in required if r not in trees[0][0]]
+    if unreachable:
+        return RequiredRoute(unreachable=unreachable, reason="Required pages unreachable from Start")
+
+    # Nearest End from every key page
+    to_end = []
+    for dist, _ in trees:
+        best = min(((dist[e], e) for e in ends if e in dist), default=None)
+        to_end.append(best)
+
+    k = len(required)
+    if k == 0:
+        if to_end[0] is None:
+            return RequiredRoute(reason="no path from Start to End")
+        return RequiredRoute(path=_walk(trees[0][1], to_end[0][1]))
+
+    inf = float("inf")
+    # dist_kk[i][j]: Required i -> Required j (keys offset by one)
+    dist_kk = [[trees[i + 1][0].get(required[j], inf) for j in range(k)] for i in range(k)]
+    from_start = [trees[0][0][r] for r in required]
+    finish = [inf if to_end[i + 1] is None else to_end[i + 1][0] for i in range(k)]
+
+    order, optimal = None, True
+    if k <= MAX_EXACT_REQUIRED:
+        order = _bitmask_dp(k, from_start, dist_kk, finish, deadline)
+    if order is None:
+        optimal = False
+        order = _nearest_neighbour(k, from_start, dist_kk, finish)
+    if order is None:
+        return RequiredRoute(reason="no route through every Required page reaches an End")
+
+    path = _walk(trees[0][1], required[order[0]])
+    for a, b in zip(order, order[1:]):
+        path.extend(_walk(trees[a + 1][1], required[b])[1:])
+    path.extend(_walk(trees[order[-1] + 1][1], to_end[order[-1] + 1][1])[1:])
+    return RequiredRoute(path=path, order=[required[i] for i in order], optimal=optimal)
+
+
+def _bitmask_dp(k, from_start, dist_kk, finish, deadline):
+    inf = float("inf")
+    full = (1 << k) - 1
+    cost = [[inf] * k for _ in range(1 << k)]
+    back = [[-1] * k for _ in range(1 << k)]
+    for i in range(k):
+        cost[1 << i][i] = from_start[i]
+    for mask in range(1, full + 1):
+        if not mask & 0xFF and time.perf_counter() > deadline:
+            return None
+        row = cost[mask]
+        for i in range(k):
+            here = row[i]
+            if here == inf or not mask >> i & 1:
+                continue
+            dist_i = dist_kk[i]
+            for j in range(k):
+                if mask >> j & 1:
+                    continue
+                step = here + dist_i[j]
+                nxt = mask | 1 << j
+                if step < cost[nxt][j]:
+                    cost[nxt][j] = step
+                    back[nxt][j] = i
+    best, last = min((cost[full][i] + finish[i], i) for i in range(k))
+    if best == inf:
+        return None
+    order, mask = [], full
+    while last != -1:
+        order.append(last)
+        last, mask = back[mask][last], mask & ~(1 << last)
+    return order[::-1]
+
+
+def _nearest_neighbour(k, from_start, dist_kk, finish):
+    inf = float("inf")
+    left = set(range(k))
+    current = min(left, key=lambda i: from_start[i])
+    order = [current]
+    left.discard(current)
+    while left:
+        current = min(left, key=lambda j: dist_kk[current][j])
+        if dist_kk[order[-1]][current] == inf:
+            return None
+        order.append(current)
+        left.discard(current)
+    return None if finish[order[-1]] == inf else order
+
+
+# --- Route enumeration ---
+def route_successors(graph, avoid_dead=False, avoid_secret=False):
+    """``successors(page_id)`` honouring the filters; End pages are not expanded."""
+    succ = graph.succ
+    ends = set(graph.page_ids_tagged("End"))
+    dead = set(graph.page_ids_tagged("Dead")) if avoid_dead else set()
+    edge_row, flags = graph.edge_row, graph.store.flags
+
+    def successors(node):
+        if node in ends:
+            return ()
+        if not dead and not avoid_secret:
+            return succ[node]
+        return [
+            d for d in succ[node]
+            if d not in dead and not (avoid_secret and flags[edge_row[node, d]] & SECRET)
+        ]
+
+    return successors
+
+
+def _distances_to(targets, successors, nodes):
+    """Hops from each of ``nodes`` to the nearest target, by one reverse BFS."""
+    pred = {}
+    for v in nodes:
+        for d in successors(v):
+            pred.setdefault(d, []).append(v)
+    dist = dict.fromkeys(targets, 0)
+    frontier = list(targets)
+    while frontier:
+        nxt = []
+        for node in frontier:
+            for p in pred.get(node, ()):
+                if p not in dist:
+                    dist[p] = dist[node] + 1
+                    nxt.append(p)
+        frontier = nxt
+    return dist
+
+
+def _search_route(successors, to_end, source, targets, blocked_nodes=(), blocked_edges=(), max_hops=None):
+    """Fewest-hops path from ``source`` to any of ``targets``, or None.
+
+    A* guided by ``to_end`` (exact distances without the blocks), so a search
+    only strays from the best route as far as the blocks force it to.
+    ``(page, None)`` in ``blocked_edges`` means the route may not stop at ``page``.
+    """
+    if source not in to_end:
+        return None
+    if source in targets:
+        return None if (source, None) in blocked_edges else [source]
+    limit = float("inf") if max_hops is None else max_hops
+    parent = {source: None}
+    hops = {source: 0}
+    tiebreak = itertools.count()
+    queue = [(to_end[source], 0, next(tiebreak), source)]
+    done = set()
+    while queue:
+        _, _, _, node = heapq.heappop(queue)
+        if node in done:
+            continue
+        done.add(node)
+        if node in targets and node != source:
+            path = [node]
+            while parent[path[-1]] is not None:
+                path.append(parent[path[-1]])
+            return path[::-1]
+        step = hops[node] + 1
+        for d in successors(node):
+            if d in blocked_nodes or (node, d) in blocked_edges or d not in to_end:
+                continue
+            if d in targets and (d, None) in blocked_edges:
+                continue
+            if step + to_end[d] > limit or step >= hops.get(d, limit + 1):
+                continue
+            hops[d] = step
+            parent[d] = node
+            heapq.heappush(queue, (step + to_end[d], -step, next(tiebreak), d))
+    return None
+
+
+def _yen(successors, to_end, source, targets, max_length, paused):
+    """Yen's k-shortest simple paths, generated lazily in order of length.
+
+    Yields None (and resumes where it stopped) whenever ``paused()`` is true.
+    """
+    first = _search_route(successors, to_end, source, targets, max_hops=max_length)
+    if first is None:
+        return
+    found = [first]
+    yield first
+    candidates = []
+    seen = {tuple(first)}
+    tiebreak = itertools.count()
+    while True:
+        last = found[-1]
+        for i, spur in enumerate(last):
+            if paused():
+                yield None
+            root = last[:i + 1]
+            blocked_edges = {
+                (spur, p[i + 1] if i + 1 < len(p) else None) for p in found if p[:i + 1] == root
+            }
+            max_hops = None if max_length is None else max_length - i
+            spur_path = _search_route(successors, to_end, spur, targets, set(root[:-1]), blocked_edges, max_hops)
+            if spur_path is None:
+                continue
+            path = root[:-1] + spur_path
+            if tuple(path) not in seen:
+                seen.add(tuple(path))
+                heapq.heappush(candidates, (len(path), next(tiebreak), path))
+        if not candidates:
+            return
+        path = heapq.heappop(candidates)[2]
+        found.append(path)
+        yield path
+
+
+class RouteExplorer:
+    """Start -> End routes (page ids), shortest first, enumerated on demand.
+
+    Routes are simple paths that stop at the first End page. The explorer
+    keeps its search state, so asking for the next page of routes continues
+    where the last one stopped; keep one per graph version and filter set.
+    """
+
+    def __init__(self, graph, avoid_dead=False, avoid_secret=False, max_length=None):
+        self.routes = []
+        self.exhausted = False
+        self.reason = ""
+        self._deadline = float("inf")
+        start = graph.start_id()
+        ends = set(graph.page_ids_tagged("End"))
+        if start is None or not ends:
+            self.exhausted = True
+            self.reason = "no Start page" if start is None else "no End page"
+            return
+        successors = route_successors(graph, avoid_dead, avoid_secret)
+        to_end = _distances_to(ends, successors, range(len(graph.succ)))
+        self._search = _yen(successors, to_end, start, ends, max_length, self._paused)
+
+    def _paused(self):
+        return time.perf_counter() > self._deadline
+
+    def fetch(self, count, budget=DEFAULT_BUDGET):
+        """Find routes until ``count`` are known; False if ``budget`` seconds ran out first."""
+        self._deadline = time.perf_counter() + budget
+        while not self.exhausted and len(self.routes) < count:
+            path = next(self._search, StopIteration)
+            if path is StopIteration:
+                self.exhausted = True
+            elif path is None:
+                return False
+            else:
+                self.routes.append(path)
+        return True
+
+    def page(self, index, size=10, budget=DEFAULT_BUDGET):
+        """Routes ``index * size`` up to ``(index + 1) * size`` and whether the search finished in time."""
+        complete = self.fetch((index + 1) * size, budget)
+        return self.routes[index * size:(index + 1) * size], complete
+
+
+class RouteCount:
+    def __init__(self, count, exact=True):
+        self.count = count
+        self.exact = exact
+
+
+def count_routes(graph, avoid_dead=False, avoid_secret=False, max_length=None, budget=DEFAULT_BUDGET):
+    """Number of distinct Start -> End routes under the same rules as ``RouteExplorer``.
+
+    Exact and linear-time (per length) when the pages that matter form a
+    DAG; with loops, routes are counted one by one until ``budget`` seconds
+    or ``MAX_COUNTED_ROUTES`` and the count is a lower bound.
+    """
+    start = graph.start_id()
+    ends = set(graph.page_ids_tagged("End"))
+    if start is None or not ends:
+        return RouteCount(0)
+    successors = route_successors(graph, avoid_dead, avoid_secret)
+
+    # Pages on some Start -> End walk, in topological order if there is one.
+    forward = {start}
+    stack = [start]
+    while stack:
+        for d in successors(stack.pop()):
+            if d not in forward:
+                forward.add(d)
+                stack.append(d)
+    pred = {v: [] for v in forward}
+    for v in forward:
+        for d in successors(v):
+            pred[d].append(v)
+    useful = ends & forward
+    stack = list(useful)
+    while stack:
+        for p in pred[stack.pop()]:
+            if p not in useful:
+                useful.add(p)
+                stack.append(p)
+    order = _topological(useful, successors)
+    if order is None:
+        return _count_by_search(successors, start, ends, useful, max_length, budget)
+
+    if max_length is None:
+        # ways[v]: routes from v to an End
+        ways = {}
+        for v in reversed(order):
+            ways[v] = 1 if v in ends else sum(ways[d] for d in successors(v) if d in useful)
+        return RouteCount(ways.get(start, 0))
+    total = 0
+    layer = {start: 1} if start in useful else {}
+    for _ in range(max_length + 1):
+        total += sum(n for v, n in layer.items() if v in ends)
+        nxt = {}
+        for v, n in layer.items():
+            for d in successors(v):
+                if d in useful:
+                    nxt[d] = nxt.get(d, 0) + n
+        layer = nxt
+    return RouteCount(total)
+
+
+def _topological(nodes, successors):
+    """``nodes`` in topological order, or None if they contain a cycle."""
+    indegree = dict.fromkeys(nodes, 0)
+    for v in nodes:
+        for d in successors(v):
+            if d in indegree:
+                indegree[d] += 1
+    ready = [v for v, n in indegree.items() if not n]
+    order = []
+    while ready:
+        v = ready.pop()
+        order.append(v)
+        for d in successors(v):
+            if d in indegree:
+                indegree[d] -= 1
+                if not indegree[d]:
+                    ready.append(d)
+    return order if len(order) == len(nodes) else None
+
+
+def _count_by_search(successors, start, ends, useful, max_length, budget):
+    if start in ends:
+        return RouteCount(1)
+    deadline = time.perf_counter() + budget
+    count = 0
+    on_path = {start}
+    stack = [(start, iter(successors(start)))]
+    steps = 0
+    while stack:
+        steps += 1
+        if not steps & 0xFFF and (time.perf_counter() > deadline or count >= MAX_COUNTED_ROUTES):
+            return RouteCount(count, exact=False)
+        node, children = stack[-1]
+        d = next(children, None)
+        if d is None:
+            stack.pop()
+            on_path.discard(node)
+        elif d in ends:
+            count += 1
+        elif d in useful and d not in on_path and (max_length is None or len(stack) < max_length):
+            on_path.add(d)
+            stack.append((d, iter(successors(d))))
+    return RouteCount(count)
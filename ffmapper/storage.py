@@ -0,0 +1,223 @@
+"""Optional SQLite persistence: one project (book) per edge table slice.
+
+Enabled by pointing ``FF_MAPPER_DB`` at a database file. Only the project a
+session is working on is ever loaded into memory.
+"""
+import sqlite3
+import threading
+
+from ffmapper.edge_store import TAG_BITS, EdgeStore
+
+DB_ENV = "FF_MAPPER_DB"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS edges (
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    from_page TEXT NOT NULL,
+    to_page TEXT NOT NULL,
+    chosen INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    is_secret INTEGER NOT NULL,
+    PRIMARY KEY (project_id, from_page, to_page)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edges_order ON edges (project_id, seq);
+CREATE INDEX IF NOT EXISTS edges_to ON edges (project_id, to_page);
+CREATE TABLE IF NOT EXISTS node_tags (
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    page TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (project_id, page, tag)
+) WITHOUT ROWID;
+"""
+
+# seq only orders rows on load; two sessions may both write the same seq.
+UPSERT_EDGE = """
+INSERT INTO edges (project_id, seq, from_page, to_page, chosen, tag, is_secret) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (project_id, from_page, to_page)
+DO UPDATE SET chosen = excluded.chosen, tag = excluded.tag, is_secret = excluded.is_secret
+"""
+
+
+class ProjectStore:
+    """Thread-safe wrapper around one SQLite connection in WAL mode."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        positional = self._positional_edges()
+        if positional:
+            self._conn.execute("DROP INDEX IF EXISTS edges_from")
+            self._conn.execute("DROP INDEX IF EXISTS edges_to")
+            self._conn.execute("ALTER TABLE edges RENAME TO edges_positional")
+        self._conn.executescript(SCHEMA)
+        if positional:
+            self._migrate_positional()
+
+    def _positional_edges(self):
+        """True for a database written when edge rows were keyed by position."""
+        key = sorted((r[5], r[1]) for r in self._conn.execute("PRAGMA table_info(edges)") if r[5])
+        return [name for _, name in key] == ["project_id", "seq"]
+
+    def _migrate_positional(self):
+        # Read each project back through an EdgeStore, which merges repeated
+        # (from, to) rows and files tag rows as page tags, then write it keyed.
+        with self._conn:
+            for (project_id,) in self._conn.execute("SELECT DISTINCT project_id FROM edges_positional").fetchall():
+                store = EdgeStore()
+                store.extend(
+                    (f, t, bool(c), tag, bool(s)) for f, t, c, tag, s in self._conn.execute(
+                        "SELECT from_page, to_page, chosen, tag, is_secret FROM edges_positional"
+                        " WHERE project_id = ? ORDER BY seq",
+                        (project_id,),
+                    )
+                )
+                self._conn.executemany(UPSERT_EDGE, self._edge_rows(project_id, store, range(len(store))))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO node_tags VALUES (?, ?, ?)",
+                    [(project_id, page, tag) for page, _, _, tag, _ in store.iter_tag_rows()],
+                )
+            self._conn.execute("DROP TABLE edges_positional")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _project_id(self, name, create=False):
+        row = self._conn.execute("SELECT id FROM projects WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            return None
+        return self._conn.execute("INSERT INTO projects (name) VALUES (?)", (name,)).lastrowid
+
+    def list_projects(self):
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT name FROM projects ORDER BY name")]
+
+    def delete_project(self, name):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM projects WHERE name = ?", (name,))
+
+    def saved_count(self, name):
+        with self._lock:
+            project_id = self._project_id(name)
+            if project_id is None:
+                return 0
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM edges WHERE project_id = ?", (project_id,)
+            ).fetchone()[0]
+
+    def load(self, name):
+        """EdgeStore holding every saved edge of ``name`` (empty if new)."""
+        store = EdgeStore()
+        with self._lock:
+            project_id = self._project_id(name)
+            if project_id is None:
+                return store
+            cursor = self._conn.execute(
+                "SELECT from_page, to_page, chosen, tag, is_secret FROM edges"
+                " WHERE project_id = ? ORDER BY seq",
+                (project_id,),
+            )
+            while True:
+                rows = cursor.fetchmany(5000)
+                if not rows:
+                    break
+                store.extend((f, t, bool(c), tag, bool(s)) for f, t, c, tag, s in rows)
+            for page, tag in self._conn.execute(
+                "SELECT page, tag FROM node_tags WHERE project_id = ?", (project_id,)
+            ):
+                if tag in TAG_BITS:
+                    store.add_page_tag(store.intern(page), tag)
+        # What was just read is what is saved; nothing to undo or write back.
+        store.journal.clear()
+        store.saved_rows = len(store)
+        store.dirty_rows.clear()
+        store.dirty_pages.clear()
+        return store
+
+    def save(self, name, store):
+        """Persist what changed since the last save.
+
+        Edges are keyed by their (from, to) pages and upserted: rows appended
+        since the last save and rows changed in place are written, saved edges
+        an undo dropped are deleted, nothing else is touched. Page tags are
+        rewritten only for the pages whose tags changed. Two sessions saving
+        the same book therefore add to each other rather than overwrite by
+        position.
+        """
+        with self._lock, self._conn:
+            project_id = self._project_id(name, create=True)
+            self._conn.executemany(
+                "DELETE FROM edges WHERE project_id = ? AND from_page = ? AND to_page = ?",
+                [(project_id, f, t) for f, t in store.dropped_edges],
+            )
+            self._conn.executemany(
+                "DELETE FROM node_tags WHERE project_id = ? AND page = ?",
+                [(project_id, page) for page in store.dropped_pages],
+            )
+            rows = sorted(store.dirty_rows.union(range(store.saved_rows, len(store))))
+            self._conn.executemany(UPSERT_EDGE, self._edge_rows(project_id, store, rows))
+            pages = [store.pages[page] for page in sorted(store.dirty_pages)]
+            self._conn.executemany(
+                "DELETE FROM node_tags WHERE project_id = ? AND page = ?", [(project_id, page) for page in pages]
+            )
+            self._conn.executemany(
+                "INSERT INTO node_tags VALUES (?, ?, ?)",
+                [
+                    (project_id, page, tag) for page in pages
+                    for tag, bit in TAG_BITS.items() if store.page_tags[store.page_ids[page]] & bit
+                ],
+            )
+            store.saved_rows = len(store)
+            store.dirty_rows.clear()
+            store.dirty_pages.clear()
+            store.dropped_edges.clear()
+            store.dropped_pages.clear()
+            return len(rows)
+
+    @staticmethod
+    def _edge_rows(project_id, store, rows):
+        for seq in rows:
+            f, t, c, tag, s = store.edge(seq)
+            yield project_id, seq, f, t, int(c), tag, int(s)
+
+    def edges_from(self, name, page):
+        return self._page_query(name, "from_page", page)
+
+    def edges_to(self, name, page):
+        return self._page_query(name, "to_page", page)
+
+    def _page_query(self, name, column, page):
+        with self._lock:
+            project_id = self._project_id(name)
+            if project_id is None:
+                return []
+            return [
+                (f, t, bool(c), tag, bool(s))
+                for f, t, c, tag, s in self._conn.execute(
+                    "SELECT from_page, to_page, chosen, tag, is_secret FROM edges"
+                    f" WHERE project_id = ? AND {column} = ? ORDER BY seq",
+                    (project_id, page),
+                )
+            ]
+
+    def tagged_pages(self, name, tag):
+        with self._lock:
+            project_id = self._project_id(name)
+            if project_id is None:
+                return []
+            return [
+                r[0] for r in self._conn.execute(
+                    "SELECT page FROM node_tags WHERE project_id = ? AND tag = ?", (project_id, tag)
+                )
+            ]
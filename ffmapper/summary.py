@@ -0,0 +1,232 @@
+"""Collapsed display of a GraphModel: chains and loops become super-nodes."""
+from ffmapper.analysis import BULK_ROWS
+from ffmapper.edge_store import SECRET, TAG_BITS
+from ffmapper.render import BORDER_WIDTH, DEFAULT_STYLE, HIGHLIGHT_COLOR, edge_options, node_options
+
+# Shorter runs of one-way-in, one-way-out pages are drawn as they are.
+MIN_CHAIN = 2
+# Pages listed in a super-node's tooltip.
+TITLE_PAGES = 20
+# Which member a super-node takes its colour from: the first tag found wins.
+TAG_PRIORITY = ("Dead", "End", "Required", "Start")
+
+CHAIN_PREFIX = "chain:"
+LOOP_PREFIX = "loop:"
+
+
+class ChainIndex:
+    """Maximal runs of pages with exactly one way in and one way out.
+
+    ``chains`` maps a chain id to its page ids in reading order and
+    ``chain_of`` a page id to its chain. Inserting an edge only changes the
+    degrees of its two ends, so only chains through them or right next to
+    them are dissolved and regrown; the cost is the length of those chains.
+    Rollbacks and bulk batches are handled by one linear rebuild.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self._row = 0
+        self._rollbacks = graph.rollbacks
+        self._next_id = 0
+        self.chains = {}
+        self.chain_of = {}
+        self.version = -1
+
+    def refresh(self):
+        """Fold in everything the graph has synced since the last call."""
+        graph = self.graph
+        end = graph.synced_rows
+        if graph.rollbacks != self._rollbacks or end < self._row or end - self._row > max(BULK_ROWS, self._row):
+            return self._rebuild()
+        if end > self._row:
+            store = graph.store
+            touched = set(store.src[self._row:end])
+            touched.update(store.dst[self._row:end])
+            recheck = set(touched)
+            for node in touched:
+                # A page that just became one-in/one-out may join its neighbours' chains.
+                if self._interior(node):
+                    recheck.update(graph.pred[node])
+                    recheck.update(graph.succ[node])
+            for node in list(recheck):
+                chain = self.chain_of.get(node)
+                if chain is not None:
+                    for member in self.chains.pop(chain):
+                        del self.chain_of[member]
+                        recheck.add(member)
+            for node in recheck:
+                if node not in self.chain_of and self._interior(node):
+                    self._grow(node)
+            self._row = end
+        self.version = graph.version
+        return self
+
+    def _rebuild(self):
+        graph = self.graph
+        self.__init__(graph)
+        for node in range(len(graph.succ)):
+            if node not in self.chain_of and self._interior(node):
+                self._grow(node)
+        self._row = graph.synced_rows
+        self.version = graph.version
+        return self
+
+    def _interior(self, node):
+        pred, succ = self.graph.pred[node], self.graph.succ[node]
+        return len(pred) == 1 and len(succ) == 1 and node not in succ
+
+    def _grow(self, node):
+        """Register the maximal chain through interior page ``node``, if long enough."""
+        pred, succ = self.graph.pred, self.graph.succ
+        chain = [node]
+        seen = {node}
+        prev = next(iter(pred[node]))
+        while prev not in seen and self._interior(prev):
+            chain.append(prev)
+            seen.add(prev)
+            prev = next(iter(pred[prev]))
+        chain.reverse()
+        nxt = next(iter(succ[node]))
+        while nxt not in seen and self._interior(nxt):
+            chain.append(nxt)
+            seen.add(nxt)
+            nxt = next(iter(succ[nxt]))
+        if len(chain) < MIN_CHAIN:
+            return
+        chain_id = self._next_id
+        self._next_id += 1
+        self.chains[chain_id] = chain
+        for member in chain:
+            self.chain_of[member] = chain_id
+
+
+class Summary:
+    """Display graph with chains (and optionally loops) folded into super-nodes.
+
+    ``group`` maps a collapsed page id to its super-node key, ``members`` a
+    key to its page ids, and ``edges`` a display ``(from, to)`` pair to the
+    store rows it stands for. Pages that are not collapsed are keyed by
+    their page string, as in the full view. ``len()`` is the number of
+    nodes drawn.
+    """
+
+    def __init__(self, group, members, edges, pages):
+        self.group = group
+        self.members = members
+        self.edges = edges
+        self.pages = pages
+
+    def __len__(self):
+        return self.pages - len(self.group) + len(self.members)
+
+
+def summarize(graph, chains, analysis=None, loops=False, expanded=()):
+    """``Summary`` of ``graph``; super-node keys in ``expanded`` stay unfolded.
+
+    With ``loops``, every strongly connected region of more than one page
+    (from the incrementally maintained ``analysis``) is folded as well;
+    a chain is always wholly inside or outside such a region.
+    """
+    pages = graph.store.pages
+    group = {}
+    members = {}
+    if loops and analysis is not None:
+        components = graph.memo("components", analysis.refresh().components)
+        for rep, nodes in components.items():
+            key = LOOP_PREFIX + pages[rep]
+            if key not in expanded:
+                members[key] = nodes
+                group.update(dict.fromkeys(nodes, key))
+    for chain in chains.refresh().chains.values():
+        key = CHAIN_PREFIX + pages[chain[0]]
+        if chain[0] not in group and key not in expanded:
+            members[key] = chain
+            group.update(dict.fromkeys(chain, key))
+
+    key_of = list(pages)
+    for node, key in group.items():
+        key_of[node] = key
+    edges = {}
+    store = graph.store
+    end = graph.synced_rows
+    for row, (s, d) in enumerate(zip(store.src[:end], store.dst[:end])):
+        a, b = key_of[s], key_of[d]
+        if a == b and s in group:
+            continue
+        pair = (a, b)
+        rows = edges.get(pair)
+        if rows is None:
+            edges[pair] = [row]
+        else:
+            rows.append(row)
+    return Summary(group, members, edges, len(graph.succ))
+
+
+def summary_records(graph, summary, analysis=None, positions=None, odds=None, highlight=(), style=DEFAULT_STYLE):
+    """vis.js node and edge records of a ``Summary``, ids included."""
+    store = graph.store
+    pages = store.pages
+    opts = dict(style)
+    group, members = summary.group, summary.members
+    nodes = {}
+    grouped = {}
+    for node, options in node_options(graph, analysis, positions=positions, odds=odds, highlight=highlight):
+        if node in group:
+            grouped[node] = options
+        else:
+            options["id"] = pages[node]
+            nodes[options["id"]] = options
+
+    on_route = set(highlight)
+    page_tags = store.page_tags
+    for key, member_ids in members.items():
+        shown = min(member_ids, key=lambda node: _priority(page_tags[node]))
+        options = dict(grouped[shown])
+        color = options["color"]
+        if isinstance(color, dict):
+            color = color["background"]
+        tags = {tag: [pages[n] for n in member_ids if page_tags[n] & bit] for tag, bit in TAG_BITS.items()}
+        tags = {tag: found for tag, found in tags.items() if found}
+        tagged = [f"{tag}: {', '.join(found)}" for tag, found in tags.items()]
+        loop = key.startswith(LOOP_PREFIX)
+        listed = (", " if loop else " → ").join(pages[n] for n in member_ids[:TITLE_PAGES])
+        if len(member_ids) > TITLE_PAGES:
+            listed += " …"
+        if loop:
+            label = f"⟳ {pages[member_ids[0]]} (+{len(member_ids) - 1})"
+        else:
+            label = f"{pages[member_ids[0]]} ⋯ {pages[member_ids[-1]]}"
+        if tags:
+            # Tags stay visible on the canvas, not only in the tooltip.
+            label += "\n" + " ".join(tags)
+        options.update(
+            id=key, label=label, shape="box", color=color,
+            title="\n".join([f"{len(member_ids)} pages, click to expand", *tagged, listed]),
+        )
+        options["borderWidth"] = BORDER_WIDTH
+        if on_route.intersection(member_ids):
+            options.update(borderWidth=4, color={"background": color, "border": HIGHLIGHT_COLOR})
+        if positions is not None:
+            options["x"] = sum(positions[n][0] for n in member_ids) / len(member_ids)
+            options["y"] = sum(positions[n][1] for n in member_ids) / len(member_ids)
+        nodes[key] = options
+
+    route = set(zip(highlight, highlight[1:]))
+    src, dst, flags = store.src, store.dst, store.flags
+    edges = {}
+    for (a, b), rows in summary.edges.items():
+        highlighted = any((src[row], dst[row]) in route for row in rows)
+        options = edge_options(store, rows[0], opts, highlighted)
+        if len(rows) > 1:
+            options.update(title=f"{len(rows)} choices", dashes=all(flags[row] & SECRET for row in rows))
+        options.update(id=f"{a}->{b}", **{"from": a, "to": b})
+        edges[options["id"]] = options
+    return nodes, edges
+
+
+def _priority(bits):
+    for rank, tag in enumerate(TAG_PRIORITY):
+        if bits & TAG_BITS[tag]:
+            return rank
+    return len(TAG_PRIORITY)
@@ -0,0 +1,110 @@
+"""Whole-map validation: the mistakes that are hard to spot on the canvas."""
+from ffmapper.edge_store import TAG_BITS
+from ffmapper.parser import SUFFIX_CHARS
+
+ERROR = "error"
+WARNING = "warning"
+
+# Fighting Fantasy gamebooks have 400 numbered sections.
+DEFAULT_SECTIONS = 400
+
+# check name -> (severity, heading); also the display order.
+CHECKS = {
+    "malformed": (ERROR, "Malformed page token"),
+    "out_of_range": (ERROR, "Page outside the book"),
+    "dead_and_end": (ERROR, "Tagged both Dead and End"),
+    "multiple_starts": (ERROR, "More than one Start"),
+    "dead_with_exits": (WARNING, "Dead page with choices"),
+    "orphan_required": (WARNING, "Orphan Required page"),
+    "unreachable": (WARNING, "Unreachable from Start"),
+}
+
+
+class Issue:
+    __slots__ = ("check", "severity", "page", "detail")
+
+    def __init__(self, check, page, detail):
+        self.check = check
+        self.severity = CHECKS[check][0]
+        self.page = page
+        self.detail = detail
+
+    def row(self):
+        """Plain dict for tables and JSON."""
+        return {"severity": self.severity, "check": CHECKS[self.check][1], "page": self.page, "detail": self.detail}
+
+
+def _malformed(page):
+    """Why ``page`` is not a bare section number, or None if it is one."""
+    if _is_number(page):
+        return None
+    if page != page.strip() or " " in page:
+        return "contains spaces; marks must follow the number directly"
+    marks = [c for c in page if c in SUFFIX_CHARS]
+    if marks:
+        # rstrip only removes marks at the end, so these were kept in the page.
+        return f"marks {''.join(marks)!r} inside the page; a mark goes after the number"
+    return "not a section number"
+
+
+def validate(graph, distances, analysis, sections=DEFAULT_SECTIONS, marks=()):
+    """Every ``Issue`` of the map, from one pass over its pages.
+
+    ``distances`` (a ``DistanceIndex``) and ``analysis`` (a
+    ``ReachabilityIndex``) are refreshed first; their incrementally kept
+    facts make each per-page check O(1). ``marks`` are the parser's
+    ``MarkWarning``s: tokens whose conflicting or repeated marks were partly
+    dropped, which the map itself no longer shows. Those still on the map
+    are reported as malformed.
+    """
+    store = graph.store
+    pages = store.pages
+    distances.refresh()
+    analysis.refresh()
+    start = graph.start_id()
+    has_end = bool(analysis.ends)
+    reaches_end = analysis.reaches_end
+    dead_bit, end_bit = TAG_BITS["Dead"], TAG_BITS["End"]
+    required_bit, start_bit = TAG_BITS["Required"], TAG_BITS["Start"]
+    issues = []
+    starts = []
+    for node, (page, bits) in enumerate(zip(pages, store.page_tags)):
+        if node >= len(graph.succ):
+            break
+        problem = _malformed(page)
+        if problem:
+            issues.append(Issue("malformed", page, problem))
+        elif not 1 <= int(page) <= sections:
+            issues.append(Issue("out_of_range", page, f"the book has sections 1-{sections}"))
+        if bits & dead_bit and bits & end_bit:
+            issues.append(Issue("dead_and_end", page, "a page cannot both kill and finish the adventure"))
+        if bits & dead_bit and graph.succ[node]:
+            exits = ", ".join(sorted((pages[d] for d in graph.succ[node]), key=_page_order))
+            issues.append(Issue("dead_with_exits", page, f"leads on to {exits}"))
+        if bits & start_bit:
+            starts.append(page)
+        reachable = start is None or distances.distance(node) is not None
+        if not reachable:
+            issues.append(Issue("unreachable", page, f"no route from {pages[start]}"))
+        if bits & required_bit and (not reachable or (has_end and node not in reaches_end)):
+            detail = "cannot be reached from Start" if not reachable else "no End can be reached from it"
+            issues.append(Issue("orphan_required", page, detail))
+    page_ids = store.page_ids
+    for page, detail in dict.fromkeys((warning.page, warning.message) for warning in marks):
+        if page_ids.get(page, len(graph.succ)) < len(graph.succ):
+            issues.append(Issue("malformed", page, detail))
+    if len(starts) > 1:
+        issues.extend(
+            Issue("multiple_starts", page, f"Start pages: {', '.join(starts)}") for page in starts
+        )
+    order = {check: i for i, check in enumerate(CHECKS)}
+    issues.sort(key=lambda issue: (issue.severity != ERROR, order[issue.check], _page_order(issue.page)))
+    return issues
+
+
+def _is_number(page):
+    return page.isascii() and page.isdigit()
+
+
+def _page_order(page):
+    return (0, int(page), "") if _is_number(page) else (1, 0, page)
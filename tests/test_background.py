@@ -0,0 +1,44 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ffmapper import EdgeStore, GraphModel
+from ffmapper.background import Analytics
+from ffmapper.parser import parse_line
+
+
+def _blocked(gate):
+    def compute(snapshot):
+        gate.wait(5)
+        return len(snapshot.store)
+
+    return compute
+
+
+def test_superseded_queued_jobs_are_cancelled():
+    pool = ThreadPoolExecutor(max_workers=2)
+    gate = threading.Event()
+    graph = GraphModel(EdgeStore())
+    graph.store.extend(parse_line("1,2,3"))
+    graph.sync()
+    analytics = Analytics(lambda: pool)
+    running = analytics.submit(graph, "a", _blocked(gate))
+    queued = analytics.submit(graph, "b", _blocked(gate))
+    graph.store.extend(parse_line("3,4"))
+    graph.sync()
+    latest = analytics.submit(graph, "b", _blocked(gate))
+    assert queued.cancelled() and not running.cancelled()
+    gate.set()
+    assert latest.result(5) == 3
+    pool.shutdown()
+
+
+def test_one_session_cannot_fill_the_pool():
+    pool = ThreadPoolExecutor(max_workers=2)
+    gate = threading.Event()
+    busy, quiet = GraphModel(EdgeStore()), GraphModel(EdgeStore())
+    busy_session, quiet_session = Analytics(lambda: pool), Analytics(lambda: pool)
+    for key in range(5):
+        busy_session.submit(busy, key, _blocked(gate))
+    assert quiet_session.submit(quiet, "a", lambda snapshot: "done").result(5) == "done"
+    gate.set()
+    pool.shutdown()
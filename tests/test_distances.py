@@ -0,0 +1,51 @@
+import random
+
+from ffmapper import EdgeStore, GraphModel
+from ffmapper.analysis import ReachabilityIndex
+from ffmapper.distances import DistanceIndex
+from ffmapper.oplog import OpLog
+from ffmapper.parser import parse_line
+
+
+def _session():
+    graph = GraphModel(EdgeStore())
+    return graph, DistanceIndex(graph), OpLog(graph, ReachabilityIndex(graph))
+
+
+def _facts(graph, index):
+    nodes = range(len(graph.succ))
+    return (
+        [index.distance(n) for n in nodes],
+        [index.distance_to_end(n) for n in nodes],
+        index.route_to_end(graph.start_id()) if graph.start_id() is not None else None,
+    )
+
+
+def test_undo_then_larger_op_rebuilds():
+    graph, distances, oplog = _session()
+    oplog.record("a", parse_line("1,2,3t"))
+    distances.refresh()
+    oplog.undo()
+    oplog.record("b", parse_line("1,4,5,6t"))
+    route = distances.refresh().route_to_end(graph.start_id())
+    assert [graph.store.pages[p] for p in route] == ["1", "6"]
+
+
+def test_incremental_matches_rebuild_across_undo_redo():
+    rng = random.Random(7)
+    graph, distances, oplog = _session()
+    for step in range(300):
+        roll = rng.random()
+        if roll < 0.2:
+            oplog.undo()
+        elif roll < 0.3:
+            oplog.redo()
+        else:
+            pages = [str(rng.randint(1, 40)) for _ in range(rng.randint(2, 4))]
+            if rng.random() < 0.2:
+                pages[-1] += "t"
+            oplog.record(f"op {step}", parse_line(",".join(pages)))
+        if rng.random() < 0.5:
+            distances.refresh()
+        if graph.start_id() is not None:
+            assert _facts(graph, distances.refresh()) == _facts(graph, DistanceIndex(graph).refresh())
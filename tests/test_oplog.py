@@ -0,0 +1,83 @@
+import random
+
+from ffmapper import EdgeStore, GraphModel
+from ffmapper.analysis import ReachabilityIndex
+from ffmapper.oplog import OpLog
+from ffmapper.parser import parse_line
+from ffmapper.summary import ChainIndex
+
+
+def _reach_facts(index):
+    index.refresh()
+    return (
+        index.reaches_end,
+        index.reaches_dead,
+        index.frontier,
+        sorted(sorted(nodes) for nodes in index.components().values()),
+    )
+
+
+def _chain_facts(chains):
+    chains.refresh()
+    return sorted(chains.chains.values())
+
+
+def _content(store):
+    return sorted(store.iter_edges()), sorted(store.iter_tag_rows())
+
+
+def _rebuilt(graph):
+    return GraphModel(graph.store.copy())
+
+
+def _random_op(rng, oplog, step):
+    roll = rng.random()
+    if roll < 0.2:
+        oplog.undo()
+        return "undo"
+    if roll < 0.3:
+        oplog.redo()
+        return "redo"
+    marks = ["", "", "", "x", "t", "+", "*"]
+    pages = [str(rng.randint(1, 30)) + rng.choice(marks) for _ in range(rng.randint(2, 4))]
+    oplog.record(f"op {step}", parse_line(",".join(pages)))
+    return "add"
+
+
+def test_snapshots_stay_bounded_and_undo_still_matches_rebuild():
+    graph = GraphModel(EdgeStore())
+    oplog = OpLog(graph, ReachabilityIndex(graph), snapshot_every=1, max_snapshots=4)
+    for step in range(40):
+        oplog.record(f"op {step}", parse_line(f"{step},{step + 1},{step % 7}" + ("t" if step % 5 == 0 else "")))
+        assert len(oplog.snapshots) <= 4
+    for _ in range(40):
+        oplog.undo()
+        assert _reach_facts(oplog.analysis) == _reach_facts(ReachabilityIndex(_rebuilt(graph)))
+
+
+def test_incremental_indexes_match_rebuild_across_undo_redo():
+    rng = random.Random(11)
+    graph = GraphModel(EdgeStore())
+    oplog = OpLog(graph, ReachabilityIndex(graph), snapshot_every=3, max_snapshots=3)
+    chains = ChainIndex(graph)
+    for step in range(300):
+        _random_op(rng, oplog, step)
+        if rng.random() < 0.5:
+            continue
+        rebuilt = _rebuilt(graph)
+        assert (graph.succ, graph.pred) == (rebuilt.succ, rebuilt.pred)
+        assert _reach_facts(oplog.analysis) == _reach_facts(ReachabilityIndex(rebuilt))
+        assert _chain_facts(chains) == _chain_facts(ChainIndex(rebuilt))
+
+
+def test_undo_and_redo_return_to_earlier_states():
+    rng = random.Random(5)
+    graph = GraphModel(EdgeStore())
+    oplog = OpLog(graph, ReachabilityIndex(graph))
+    states = [_content(graph.store)]
+    for step in range(300):
+        head = oplog.head
+        if _random_op(rng, oplog, step) == "add" and oplog.head > head:
+            del states[oplog.head:]
+            states.append(_content(graph.store))
+        assert _content(graph.store) == states[oplog.head]
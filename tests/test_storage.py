@@ -0,0 +1,81 @@
+import random
+import sqlite3
+
+from ffmapper import EdgeStore, GraphModel
+from ffmapper.analysis import ReachabilityIndex
+from ffmapper.oplog import OpLog
+from ffmapper.parser import parse_line
+from ffmapper.storage import ProjectStore
+
+
+def _session():
+    graph = GraphModel(EdgeStore())
+    return graph, OpLog(graph, ReachabilityIndex(graph))
+
+
+def test_undo_then_same_size_add_replaces_saved_rows(tmp_path):
+    projects = ProjectStore(str(tmp_path / "maps.db"))
+    graph, oplog = _session()
+    oplog.record("a", parse_line("1,2,3"))
+    projects.save("book", graph.store)
+    oplog.undo()
+    oplog.record("b", parse_line("7,8,9"))
+    projects.save("book", graph.store)
+    assert list(projects.load("book").iter_edges()) == list(graph.store.iter_edges())
+    projects.close()
+
+
+def test_two_sessions_on_one_book_keep_both_edges(tmp_path):
+    path = str(tmp_path / "maps.db")
+    first, second = ProjectStore(path), ProjectStore(path)
+    graph_a, oplog_a = _session()
+    graph_b, oplog_b = _session()
+    oplog_a.record("a", parse_line("1,2,3,4"))
+    oplog_b.record("b", parse_line("7,8,9"))
+    first.save("book", graph_a.store)
+    second.save("book", graph_b.store)
+    edges = {(f, t) for f, t, _, _, _ in first.load("book").iter_edges()}
+    assert edges == {("1", "2"), ("1", "3"), ("1", "4"), ("7", "8"), ("7", "9")}
+    first.close()
+    second.close()
+
+
+def test_positional_database_is_migrated(tmp_path):
+    path = str(tmp_path / "maps.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE projects (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);"
+        "CREATE TABLE edges (project_id INTEGER NOT NULL, seq INTEGER NOT NULL, from_page TEXT NOT NULL,"
+        " to_page TEXT NOT NULL, chosen INTEGER NOT NULL, tag TEXT NOT NULL, is_secret INTEGER NOT NULL,"
+        " PRIMARY KEY (project_id, seq)) WITHOUT ROWID;"
+        "INSERT INTO projects VALUES (1, 'book');"
+        "INSERT INTO edges VALUES (1, 0, '1', '2', 1, '', 0), (1, 1, '1', '2', 1, '', 1),"
+        " (1, 2, '2', '2', 0, 'End', 0);"
+    )
+    conn.commit()
+    conn.close()
+    projects = ProjectStore(path)
+    store = projects.load("book")
+    assert list(store.iter_edges()) == [("1", "2", True, "", True)]
+    assert store.end_nodes() == ["2"]
+    projects.close()
+
+
+def test_save_load_round_trip_after_every_operation(tmp_path):
+    rng = random.Random(3)
+    projects = ProjectStore(str(tmp_path / "maps.db"))
+    graph, oplog = _session()
+    for step in range(200):
+        roll = rng.random()
+        if roll < 0.2:
+            oplog.undo()
+        elif roll < 0.3:
+            oplog.redo()
+        else:
+            pages = [str(rng.randint(1, 15)) + rng.choice(["", "", "x", "t", "+", "*", "s"]) for _ in range(3)]
+            oplog.record(f"op {step}", parse_line(",".join(pages)))
+        projects.save("book", graph.store)
+        loaded = projects.load("book")
+        assert list(loaded.iter_edges()) == list(graph.store.iter_edges())
+        assert sorted(loaded.iter_tag_rows()) == sorted(graph.store.iter_tag_rows())
+    projects.close()